@@ -27,6 +27,12 @@ report_page = st.Page(
     icon="📊",
 )
 
+prediction_page = st.Page(
+    page="pages/analysis/predictions.py",
+    title="Predictions",
+    icon="🔮",
+)
+
 feedmill_motor_page = st.Page(
     page="pages/machines/feedmillmotors.py",
     title="Feed Mill Motors",
@@ -42,7 +48,7 @@ compressor_page = st.Page(
 group_pages = {
     "🎛️ PT Central Panganpertiwi": [main_page],
     "🖥️ Live Tracking": [feedmill_motor_page, compressor_page],
-    "📝 Reports & Analysis": [statistic_page, report_page],
+    "📝 Reports & Analysis": [statistic_page, report_page, prediction_page],
 }
 
 pg = st.navigation(group_pages)
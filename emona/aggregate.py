@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from emona.timeindex import DAY_NS, HOUR_NS, calendar_keys
+
+##--- Time grains as the reports page names them; labels follow pandas resample
+TIME_GRAINS = ["Hourly", "Daily", "Weekly", "Monthly"]
+CYCLIC_GRAINS = ["hour", "day_of_week", "month"]
+
+
+def _reduce(labels, sums, counts):
+    """Collapse consecutive rows sharing a label (labels must be sorted)."""
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    return (
+        labels[starts],
+        np.add.reduceat(sums, starts, axis=0),
+        np.add.reduceat(counts, starts, axis=0),
+    )
+
+
+def _time_labels(hours, grain):
+    """Bucket label of each hour, in ns since epoch."""
+    if grain == "Hourly":
+        return hours
+    days = hours - hours % DAY_NS
+    if grain == "Daily":
+        return days
+    if grain == "Weekly":
+        ##--- Weeks end on Sunday, like resample("W")
+        weekday = (days // DAY_NS + 3) % 7
+        return days + (6 - weekday) * DAY_NS
+    ##--- Month end, like resample("ME")
+    months = days.astype("datetime64[ns]").astype("datetime64[M]")
+    month_end = (months + 1).astype("datetime64[D]") - np.timedelta64(1, "D")
+    return month_end.astype("datetime64[ns]").view("int64")
+
+
+def _cyclic_codes(hours, grain):
+    codes = calendar_keys(hours.astype("datetime64[ns]"))[grain].to_numpy("intp")
+    if grain == "hour":
+        return codes, 24
+    if grain == "day_of_week":
+        return codes, 7
+    return codes - 1, 12
+
+
+class Aggregates:
+    """Sums and counts of several measures at several grains.
+
+    Build with ``aggregate``. ``sum`` and ``mean`` return frames indexed by
+    the grain with one column per measure.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.tables = {}
+
+    def sum(self, grain):
+        labels, sums, _ = self.tables[grain]
+        return pd.DataFrame(sums, index=labels, columns=self.columns)
+
+    def count(self, grain):
+        labels, _, counts = self.tables[grain]
+        return pd.DataFrame(counts, index=labels, columns=self.columns)
+
+    def mean(self, grain):
+        labels, sums, counts = self.tables[grain]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        return pd.DataFrame(means, index=labels, columns=self.columns)
+
+
+def aggregate(timestamps, frames, grains=TIME_GRAINS + CYCLIC_GRAINS):
+    """Aggregate every column of ``frames`` at every grain in one pass.
+
+    ``timestamps`` must be sorted and aligned with the rows of each frame.
+    Raw rows are read once to build hourly sums and counts; every coarser
+    time grain and every cyclic grain (hour of day, day of week, month) is
+    then folded from that hourly table. Time grains are indexed by their
+    bucket timestamp, cyclic grains by hour 0-23, weekday 0-6 or month 1-12.
+    """
+    columns = [column for frame in frames for column in frame.columns]
+    result = Aggregates(columns)
+    if len(timestamps) == 0:
+        empty = np.empty((0, len(columns)))
+        for grain in grains:
+            result.tables[grain] = (np.empty(0), empty, empty)
+        return result
+
+    timestamps = np.asarray(timestamps, dtype="datetime64[ns]").view("int64")
+    values = np.column_stack([frame.to_numpy(dtype="float64") for frame in frames])
+    valid = ~np.isnan(values)
+
+    hours, sums, counts = _reduce(
+        timestamps - timestamps % HOUR_NS,
+        np.where(valid, values, 0.0),
+        valid.astype("int64"),
+    )
+
+    for grain in grains:
+        if grain in CYCLIC_GRAINS:
+            codes, size = _cyclic_codes(hours, grain)
+            present = np.flatnonzero(np.bincount(codes, minlength=size))
+            cyc_sums = np.zeros((size, len(columns)))
+            cyc_counts = np.zeros((size, len(columns)), dtype="int64")
+            np.add.at(cyc_sums, codes, sums)
+            np.add.at(cyc_counts, codes, counts)
+            labels = present + 1 if grain == "month" else present
+            result.tables[grain] = (labels, cyc_sums[present], cyc_counts[present])
+        else:
+            labels, grain_sums, grain_counts = _reduce(
+                _time_labels(hours, grain), sums, counts
+            )
+            result.tables[grain] = (
+                pd.DatetimeIndex(labels.astype("datetime64[ns]")),
+                grain_sums,
+                grain_counts,
+            )
+    return result
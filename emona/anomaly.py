@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class AnomalyDetector:
+    """Windowed 3-sigma detector fed one sample per channel at a time.
+
+    Each channel keeps the mean and sum of squared deviations of its last
+    ``window`` readings, updated with Welford's add/remove steps, so a new
+    sample costs O(1) whatever the window length. A reading is flagged when
+    it falls outside ``mean +/- sigmas * std`` of the window *before* it;
+    nothing is flagged until ``min_samples`` readings are in the window.
+    NaN readings are neither flagged nor added.
+    """
+
+    def __init__(self, channels, window=24, sigmas=3.0, min_samples=None):
+        self.channels = list(channels)
+        self.window = window
+        self.sigmas = sigmas
+        self.min_samples = window if min_samples is None else min_samples
+        n = len(self.channels)
+        self._ring = np.full((window, n), np.nan)
+        self._head = 0
+        self.count = np.zeros(n, dtype="int64")
+        self.mean = np.zeros(n)
+        self._m2 = np.zeros(n)
+
+    def bounds(self):
+        """``(lower, upper)`` of the current window, NaN while warming up."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(np.maximum(self._m2, 0.0) / (self.count - 1))
+        ready = self.count >= max(self.min_samples, 2)
+        lower = np.where(ready, self.mean - self.sigmas * std, np.nan)
+        upper = np.where(ready, self.mean + self.sigmas * std, np.nan)
+        return lower, upper
+
+    def update(self, values):
+        """Score ``values`` against the window, then slide it forward.
+
+        Returns a boolean array, True where the reading is an excursion.
+        """
+        values = np.asarray(values, dtype="float64")
+        lower, upper = self.bounds()
+        flags = (values < lower) | (values > upper)
+
+        ##--- Drop the reading leaving the window
+        old = self._ring[self._head]
+        leaving = ~np.isnan(old)
+        count = self.count - leaving
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = np.where(leaving, old - self.mean, 0.0)
+            mean = np.where(leaving & (count > 0), self.mean - delta / count, self.mean)
+        m2 = np.where(leaving, self._m2 - delta * (old - mean), self._m2)
+        mean = np.where(count > 0, mean, 0.0)
+        m2 = np.where(count > 0, m2, 0.0)
+
+        ##--- Add the new one
+        entering = ~np.isnan(values)
+        count = count + entering
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = np.where(entering, values - mean, 0.0)
+            mean = np.where(entering, mean + delta / count, mean)
+        m2 = np.where(entering, m2 + delta * (values - mean), m2)
+
+        self._ring[self._head] = values
+        self._head = (self._head + 1) % self.window
+        self.count, self.mean, self._m2 = count, mean, m2
+        return flags
@@ -0,0 +1,260 @@
+"""Rolling-origin backtest of the consumption forecasts.
+
+History is replayed from ``data/powerconsumption.csv``: at every origin the
+methods are fitted on the readings before it and scored per zone on the
+readings after it, for each horizon. Folds are independent, so they run
+across a process pool; each worker receives the history once.
+
+Run ``python -m emona.backtest`` to print MAE, MAPE and fit/predict timings
+per method, zone and horizon.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from emona.baseline import hour_of_week
+from emona.forecast import FORECAST_REGRESSORS, SeasonalRegression, weather_profile
+from emona.io import DATA_PATH, ZONE_COLUMNS, read_power_consumption
+
+DAY = pd.Timedelta(days=1)
+WEEK = pd.Timedelta(weeks=1)
+##--- Weeks of weather averaged into the profile, as on the predictions page
+WEATHER_WEEKS = 4
+
+
+def _seasonal_naive(period):
+    """Repeat the last ``period`` of readings before the origin."""
+
+    def fit(index, frame):
+        steps = int(period / _step(index))
+        last = frame[ZONE_COLUMNS].to_numpy(dtype="float64")[-steps:]
+
+        def predict(future, weather):
+            return last[np.arange(len(future)) % steps]
+
+        return predict
+
+    return fit
+
+
+def _regression(regressors, observed=False):
+    """Hour-of-week regression; future weather from the recent profile.
+
+    With ``observed`` the actual weather after the origin is used instead,
+    bounding what a perfect weather forecast would gain.
+    """
+
+    def fit(index, frame):
+        model = SeasonalRegression(ZONE_COLUMNS, regressors).update(index, frame)
+        if regressors and not observed:
+            profile = weather_profile(index, frame[regressors], WEATHER_WEEKS)
+
+        def predict(future, weather):
+            if not regressors:
+                return model.predict(future)
+            if not observed:
+                weather = profile[hour_of_week(future)]
+            return model.predict(future, weather)
+
+        return predict
+
+    return fit
+
+
+METHODS = {
+    "naive-day": _seasonal_naive(DAY),
+    "naive-week": _seasonal_naive(WEEK),
+    "hour-of-week": _regression([]),
+    "hour-of-week+weather": _regression(FORECAST_REGRESSORS),
+    "hour-of-week+observed-weather": _regression(FORECAST_REGRESSORS, observed=True),
+}
+
+##--- History shared by the folds of one worker, set by _init_worker
+_history = None
+
+
+def _step(index):
+    return pd.Series(index[:1000]).diff().median()
+
+
+def _init_worker(history):
+    global _history
+    _history = history
+
+
+def _run_fold(origin, window, methods, horizons):
+    """Score ``methods`` on the rows after position ``origin``.
+
+    Returns one record per method, zone and horizon (in rows).
+    """
+    start = 0 if window is None else max(origin - window, 0)
+    train = _history.iloc[start:origin]
+    test = _history.iloc[origin : origin + max(horizons)]
+    actual = test[ZONE_COLUMNS].to_numpy(dtype="float64")
+    weather = test[FORECAST_REGRESSORS].to_numpy(dtype="float64")
+
+    records = []
+    for name in methods:
+        started = time.perf_counter()
+        predict = METHODS[name](train.index, train)
+        fitted = time.perf_counter()
+        prediction = predict(test.index, weather)
+        predicted = time.perf_counter()
+
+        error = np.abs(prediction - actual)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative = np.where(actual != 0, error / np.abs(actual), np.nan)
+        for horizon in horizons:
+            mae = np.nanmean(error[:horizon], axis=0)
+            mape = np.nanmean(relative[:horizon], axis=0)
+            for zone, zone_mae, zone_mape in zip(ZONE_COLUMNS, mae, mape):
+                records.append(
+                    (
+                        _history.index[origin],
+                        name,
+                        zone,
+                        horizon,
+                        zone_mae,
+                        zone_mape,
+                        fitted - started,
+                        predicted - fitted,
+                    )
+                )
+    return records
+
+
+RECORD_COLUMNS = [
+    "origin",
+    "method",
+    "zone",
+    "horizon",
+    "mae",
+    "mape",
+    "fit_seconds",
+    "predict_seconds",
+]
+
+
+def origins(rows, min_train, spacing, longest):
+    """Positions of the fold origins: the first after ``min_train`` rows,
+    then every ``spacing`` rows while ``longest`` rows still follow."""
+    return list(range(min_train, rows - longest + 1, spacing))
+
+
+def backtest(
+    history,
+    methods=tuple(METHODS),
+    horizons=(DAY, WEEK, 30 * DAY),
+    min_train=8 * WEEK,
+    spacing=WEEK,
+    window=None,
+    workers=None,
+):
+    """Per-fold scores of ``methods`` over ``history``, one row per method,
+    zone, horizon and origin.
+
+    ``min_train``, ``spacing`` and ``window`` (training rows kept before the
+    origin, all of them when None) are durations, like ``horizons``. With
+    ``workers=1`` the folds run in this process.
+    """
+    step = _step(history.index)
+    steps = [int(horizon / step) for horizon in horizons]
+    window_rows = None if window is None else int(window / step)
+    fold_origins = origins(
+        len(history), int(min_train / step), int(spacing / step), max(steps)
+    )
+    if not fold_origins:
+        raise ValueError("history too short for the training span and horizons")
+
+    args = (window_rows, list(methods), steps)
+    if workers == 1:
+        _init_worker(history)
+        folds = [_run_fold(origin, *args) for origin in fold_origins]
+    else:
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(history,)
+        ) as pool:
+            futures = [pool.submit(_run_fold, origin, *args) for origin in fold_origins]
+            folds = [future.result() for future in futures]
+
+    scores = pd.DataFrame(
+        [record for fold in folds for record in fold], columns=RECORD_COLUMNS
+    )
+    scores["horizon"] = scores["horizon"] * step
+    return scores
+
+
+def summarize(scores):
+    """Mean of each score over the folds, per method, zone and horizon.
+
+    Every fold scores the same number of rows per horizon, so the mean of
+    the fold MAEs is the MAE over all of them.
+    """
+    return (
+        scores.groupby(["horizon", "zone", "method"], sort=True)[RECORD_COLUMNS[4:]]
+        .mean()
+        .reset_index()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rolling-origin backtest of the consumption forecasts"
+    )
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument(
+        "--method",
+        action="append",
+        choices=list(METHODS),
+        help="method to score, repeatable (default all)",
+    )
+    parser.add_argument(
+        "--horizon",
+        action="append",
+        type=float,
+        help="forecast horizon in days, repeatable (default 1, 7 and 30)",
+    )
+    parser.add_argument("--min-train", type=float, default=56, help="days")
+    parser.add_argument("--spacing", type=float, default=7, help="days between origins")
+    parser.add_argument(
+        "--window", type=float, help="days of training history (default all)"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="processes (default one per CPU, 1 inline)"
+    )
+    parser.add_argument("--output", help="CSV file for the per-fold scores")
+    args = parser.parse_args()
+
+    history = read_power_consumption(args.data)
+    started = time.perf_counter()
+    try:
+        scores = backtest(
+            history,
+            methods=args.method or tuple(METHODS),
+            horizons=[days * DAY for days in args.horizon or (1, 7, 30)],
+            min_train=args.min_train * DAY,
+            spacing=args.spacing * DAY,
+            window=None if args.window is None else args.window * DAY,
+            workers=args.workers or os.cpu_count(),
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        scores.to_csv(args.output, index=False)
+    summary = summarize(scores)
+    summary["mape"] = summary["mape"].map("{:.2%}".format)
+    for column in ["fit_seconds", "predict_seconds"]:
+        summary[column] = summary[column].map("{:.4f}".format)
+    print(summary.to_string(index=False, float_format="{:.1f}".format))
+    print(f"{scores['origin'].nunique()} folds in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import numpy as np
+
+from emona.timeindex import HOURS_PER_WEEK, calendar_keys
+
+##--- Scales a MAD to the standard deviation of normally distributed data
+MAD_TO_STD = 1.4826
+
+
+def hour_of_week(timestamps):
+    """Slot 0-167 of each timestamp, Monday 00:00 being slot 0."""
+    keys = calendar_keys(timestamps)
+    return keys["day_of_week"].to_numpy("intp") * 24 + keys["hour"].to_numpy("intp")
+
+
+def _grouped_medians(slots, values):
+    """Median of every column of ``values`` within each slot, ignoring NaN.
+
+    All columns are sorted together: each value is shifted by ``slot * span``
+    so one ``np.sort`` along the rows orders by slot, then by value, and NaN
+    readings sit at the end of their slot's run. Returns ``(slots, columns)``.
+    """
+    ##--- Work column-major: sorting along contiguous memory is much faster
+    columns = np.ascontiguousarray(values.T)
+    missing = np.isnan(columns)
+    low = np.fmin.reduce(columns, axis=1, initial=np.inf)
+    span = np.fmax.reduce(columns, axis=1, initial=-np.inf) - low + 1.0
+    low = np.where(np.isfinite(low), low, 0.0)[:, None]
+    span = np.where(np.isfinite(span), span, 1.0)[:, None]
+
+    keys = np.where(missing, span - 0.5, columns - low) + slots * span
+    keys.sort(axis=1)
+
+    ##--- Rows and non-NaN readings per slot
+    rows = np.bincount(slots, minlength=HOURS_PER_WEEK)
+    starts = np.r_[0, np.cumsum(rows)[:-1]]
+    present = np.flatnonzero(rows)
+    valid = np.zeros((len(columns), HOURS_PER_WEEK), dtype="int64")
+    order = np.argsort(slots, kind="stable")
+    valid[:, present] = rows[present] - np.add.reduceat(
+        missing[:, order], starts[present], axis=1, dtype="int64"
+    )
+
+    last = keys.shape[1] - 1
+    lo = np.minimum(starts + np.maximum(valid - 1, 0) // 2, last)
+    hi = np.minimum(starts + valid // 2, last)
+    base = np.arange(HOURS_PER_WEEK) * span - low
+    medians = (
+        np.take_along_axis(keys, lo, axis=1) + np.take_along_axis(keys, hi, axis=1)
+    ) / 2 - base
+    return np.where(valid > 0, medians, np.nan).T
+
+
+class SeasonalBaseline:
+    """Hour-of-week median and MAD of every column of a time frame.
+
+    Fitting and scoring work on the whole ``(rows, columns)`` block at once,
+    so hundreds of meters cost about as much as one. A reading is scored by
+    its robust z-score ``(x - median) / (1.4826 * MAD)`` against the median
+    and MAD of its own hour of the week, which keeps regular patterns such
+    as shift start-ups inside the band.
+    """
+
+    def __init__(self, timestamps, frame, threshold=3.5):
+        self.columns = list(frame.columns)
+        self.threshold = threshold
+        slots = hour_of_week(timestamps)
+        values = frame.to_numpy(dtype="float64")
+        if len(values) == 0:
+            self.median = np.full((HOURS_PER_WEEK, len(self.columns)), np.nan)
+            self.scale = self.median.copy()
+            return
+        self.median = _grouped_medians(slots, values)
+        deviations = np.abs(values - self.median[slots])
+        mad = _grouped_medians(slots, deviations)
+        ##--- A flat slot has no spread: any departure from it stands out
+        self.scale = np.fmax(MAD_TO_STD * mad, np.finfo("float64").eps)
+
+    def expected(self, timestamps, columns=None):
+        """``(median, scale)`` of each timestamp for ``columns`` (default all)."""
+        slots = hour_of_week(timestamps)
+        positions = [self.columns.index(column) for column in (columns or self.columns)]
+        return self.median[slots][:, positions], self.scale[slots][:, positions]
+
+    def bounds(self, timestamps):
+        """``(lower, upper)`` band of each timestamp, one column per meter."""
+        slots = hour_of_week(timestamps)
+        band = self.threshold * self.scale[slots]
+        return self.median[slots] - band, self.median[slots] + band
+
+    def score(self, timestamps, frame):
+        """Robust z-score of every reading; NaN where there is no baseline."""
+        slots = hour_of_week(timestamps)
+        values = frame[self.columns].to_numpy(dtype="float64")
+        return (values - self.median[slots]) / self.scale[slots]
+
+    def flags(self, timestamps, frame):
+        with np.errstate(invalid="ignore"):
+            return np.abs(self.score(timestamps, frame)) > self.threshold
@@ -0,0 +1,208 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+ChangePoint = namedtuple(
+    "ChangePoint", ["channel", "start", "detected", "shift", "relative"]
+)
+
+
+class CusumDetector:
+    """Two-sided CUSUM over many channels, fed in batches of rows.
+
+    Readings are compared with an ``expected`` level and ``scale`` given per
+    row and channel (a seasonal baseline, or a flat reference), so only a
+    persistent departure from the usual pattern accumulates. For each
+    channel and direction the statistic ``S_t = max(0, S_{t-1} + z_t - k)``
+    is evaluated for a whole batch at once through its closed form
+    ``S_t = W_t - min(0, min_{s<=t} W_s)`` with ``W`` the cumulative sum of
+    ``z - k`` started from the carried ``S``.
+
+    When ``S`` exceeds ``h`` the channel stops testing for ``settle`` rows
+    while the new level is measured, from the row after ``S`` last left
+    zero. A ``ChangePoint`` is then recorded and the channel's reference
+    moves to that level, so a shift that persists is reported once.
+    ``shift`` is the mean departure from the previous level in reading
+    units and ``relative`` the same as a fraction of that level.
+
+    ``events`` is kept ordered by detection time, then channel. Results,
+    including that order, do not depend on how the rows are split into
+    batches.
+    """
+
+    def __init__(self, channels, k=0.5, h=12.0, settle=168):
+        self.channels = list(channels)
+        self.k = k
+        self.h = h
+        self.settle = settle
+        n = len(self.channels)
+        self.offset = np.zeros(n)
+        ##--- Per side (rise, then fall): statistic and totals since it left zero
+        self.s = np.zeros(2 * n)
+        self.carry = np.zeros((4, 2 * n))
+        ##--- -1: the open run starts with the next batch
+        self.carry_start = np.full(2 * n, -1, dtype="int64")
+        ##--- Channels measuring their new level after an alarm
+        self.settle_left = np.zeros(n, dtype="int64")
+        self.pending = np.zeros((4, n))
+        self.pending_start = np.zeros(n, dtype="int64")
+        self.pending_detected = np.zeros(n, dtype="int64")
+        self.rows = 0
+        self.events = []
+
+    def _scan(self, active, z, resume):
+        """CUSUM of both sides of the ``active`` channels from ``resume`` on.
+
+        Columns are every active channel's rise, then every one's fall.
+        """
+        n = len(z)
+        dz = z[:, active] - self.offset[active]
+        steps = np.concatenate([dz - self.k, -dz - self.k], axis=1)
+        rows = np.arange(n)[:, None]
+        masked = rows < np.tile(resume[active], 2)
+        steps = np.where(masked, 0.0, np.nan_to_num(steps))
+        walk = self.s[np.r_[active, active + len(self.channels)]] + np.cumsum(
+            steps, axis=0
+        )
+        stat = walk - np.minimum(0.0, np.minimum.accumulate(walk, axis=0))
+        last_zero = np.maximum.accumulate(np.where(stat == 0.0, rows, -1), axis=0)
+        return stat, last_zero
+
+    def _totals(self, active, z, valid, expected, scale):
+        """Prefix sums of residual, deviation, reference level and count."""
+        valid = valid[:, active]
+        scale = scale[:, active]
+        dz = np.where(valid, z[:, active] - self.offset[active], 0.0)
+        reference = np.where(
+            valid, expected[:, active] + self.offset[active] * scale, 0.0
+        )
+        return np.stack(
+            [
+                np.vstack([np.zeros(len(active)), np.cumsum(total, axis=0)])
+                for total in (dz, dz * scale, reference, valid)
+            ]
+        )
+
+    def _settle(self, channel, totals, row, found):
+        """Measure the new level from ``row``; returns the row testing resumes.
+
+        ``totals`` holds the channel's prefix sums, shaped ``(4, rows + 1)``.
+        """
+        n = totals.shape[1] - 1
+        stop = min(row + self.settle_left[channel], n)
+        self.pending[:, channel] += totals[:, stop] - totals[:, row]
+        self.settle_left[channel] -= stop - row
+        if self.settle_left[channel] > 0:
+            return n
+
+        residual, deviation, reference, count = self.pending[:, channel]
+        count = max(count, 1.0)
+        shift = deviation / count
+        level = reference / count
+        found.append(
+            ChangePoint(
+                self.channels[channel],
+                pd.Timestamp(self.pending_start[channel]),
+                pd.Timestamp(self.pending_detected[channel]),
+                shift,
+                shift / level if level else np.nan,
+            )
+        )
+        self.offset[channel] += residual / count
+        return stop
+
+    def _event_order(self, event):
+        return event.detected, self.channels.index(event.channel)
+
+    def update(self, timestamps, values, expected, scale, chunk=4096):
+        """Scan newly appended rows; returns the change points they reveal.
+
+        ``values``, ``expected`` and ``scale`` are ``(rows, channels)``
+        arrays; NaN readings leave the statistics unchanged. Long histories
+        are scanned ``chunk`` rows at a time to bound memory.
+        """
+        index = pd.DatetimeIndex(timestamps)
+        values = np.asarray(values, dtype="float64")
+        expected = np.asarray(expected, dtype="float64")
+        scale = np.asarray(scale, dtype="float64")
+        found = []
+        for i in range(0, len(index), chunk):
+            rows = slice(i, i + chunk)
+            self._update(index[rows], values[rows], expected[rows], scale[rows], found)
+        ##--- Channels finish settling at different rows: keep events in the
+        ##--- order they were detected, whatever the batch boundaries
+        found.sort(key=self._event_order)
+        self.events.extend(found)
+        self.events.sort(key=self._event_order)
+        return found
+
+    def _update(self, index, values, expected, scale, found):
+        times = index.asi8
+        n, width = values.shape
+        z = (values - expected) / scale
+        valid = ~np.isnan(z)
+        resume = np.zeros(width, dtype="int64")
+
+        settling = np.flatnonzero(self.settle_left)
+        if len(settling):
+            prefix = self._totals(settling, z, valid, expected, scale)
+            for i, channel in enumerate(settling):
+                resume[channel] = self._settle(channel, prefix[:, :, i], 0, found)
+
+        ##--- Scan every channel, then rescan only those that raised an alarm
+        stat_end = np.zeros(2 * width)
+        zero_end = np.zeros(2 * width, dtype="int64")
+        tail = np.zeros((4, 2 * width))
+        active = np.arange(width)
+        while len(active):
+            a = len(active)
+            prefix = self._totals(active, z, valid, expected, scale)
+            stat, last_zero = self._scan(active, z, resume)
+            alarm = stat > self.h
+            first = np.where(alarm.any(axis=0), alarm.argmax(axis=0), n)
+
+            done = np.minimum(first[:a], first[a:]) >= n
+            local = np.r_[np.flatnonzero(done), np.flatnonzero(done) + a]
+            columns = np.r_[active[done], active[done] + width]
+            stat_end[columns] = stat[-1, local]
+            zero_end[columns] = last_zero[-1, local]
+            tail[:, columns] = (
+                prefix[:, n, local % a] - prefix[:, last_zero[-1, local] + 1, local % a]
+            )
+
+            for i in np.flatnonzero(~done):
+                channel = active[i]
+                rise, fall = channel, channel + width
+                side = i if first[i] <= first[i + a] else i + a
+                column = rise if side == i else fall
+                t = first[side]
+                begin = last_zero[t, side] + 1
+                self.pending[:, channel] = prefix[:, t + 1, i] - prefix[:, begin, i]
+                if begin == 0:
+                    ##--- The run began in an earlier batch
+                    self.pending[:, channel] += self.carry[:, column]
+                    start = self.carry_start[column]
+                    self.pending_start[channel] = times[0] if start < 0 else start
+                else:
+                    self.pending_start[channel] = times[begin]
+                self.pending_detected[channel] = times[t]
+
+                self.s[[rise, fall]] = 0.0
+                self.carry[:, [rise, fall]] = 0.0
+                self.carry_start[[rise, fall]] = -1
+                self.settle_left[channel] = self.settle
+                resume[channel] = self._settle(channel, prefix[:, :, i], t + 1, found)
+            active = active[~done]
+
+        ##--- Carry each side's open run into the next batch
+        open_run = zero_end < 0
+        self.carry = np.where(open_run, self.carry + tail, tail)
+        follows = times[np.minimum(zero_end + 1, n - 1)]
+        started = np.where(self.carry_start < 0, times[0], self.carry_start)
+        self.carry_start = np.where(
+            open_run, started, np.where(zero_end + 1 < n, follows, -1)
+        )
+        self.s = stat_end
+
+        self.rows += n
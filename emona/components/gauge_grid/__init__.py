@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import streamlit as st
+import streamlit.components.v1 as components
+
+_component = components.declare_component(
+    "gauge_grid",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend"),
+)
+
+
+def gauge_grid(
+    labels,
+    values,
+    low,
+    mid,
+    high,
+    details=None,
+    unit="W",
+    cost_per_unit=None,
+    columns=4,
+    key="gauge_grid",
+):
+    """Draw ``len(labels)`` gauges in one component.
+
+    Labels, bands and detail lines are sent once per session; afterwards a
+    rerun only ships the gauges whose value changed. The browser reports
+    which layout it holds, so a reloaded iframe gets the full payload again.
+    """
+    spec = {
+        "labels": list(labels),
+        "low": np.asarray(low, dtype=float).tolist(),
+        "mid": np.asarray(mid, dtype=float).tolist(),
+        "high": np.asarray(high, dtype=float).tolist(),
+        "details": details or [[] for _ in labels],
+        "unit": unit,
+        "cost_per_unit": cost_per_unit,
+        "columns": columns,
+    }
+    spec_id = hashlib.sha1(json.dumps(spec).encode()).hexdigest()[:16]
+    values = np.round(np.nan_to_num(np.asarray(values, dtype=float)), 2)
+
+    sent = st.session_state.setdefault(f"_{key}_sent", {"seq": 0, "values": None})
+    held = (st.session_state.get(key) or {}).get("spec_id")
+
+    if held != spec_id or sent["values"] is None:
+        ##--- Browser is missing the layout or asked for a resync
+        sent["seq"] += 1
+        payload = {
+            "spec_id": spec_id,
+            "spec": spec,
+            "seq": sent["seq"],
+            "values": values.tolist(),
+        }
+    else:
+        changed = np.flatnonzero(values != sent["values"])
+        base = sent["seq"]
+        if len(changed):
+            sent["seq"] += 1
+        payload = {
+            "spec_id": spec_id,
+            "seq": sent["seq"],
+            "base": base,
+            "delta": [[int(i), float(values[i])] for i in changed],
+        }
+    sent["values"] = values
+
+    _component(payload=payload, key=key, default=None)
@@ -0,0 +1,83 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import plotly
+import streamlit as st
+import streamlit.components.v1 as components
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+##--- plotly.js bundled with the installed plotly package, served alongside
+##--- index.html so the chart works offline without keeping a copy in the repo
+PLOTLY_JS = os.path.join(
+    os.path.dirname(plotly.__file__), "package_data", "plotly.min.js"
+)
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _install_plotly_js():
+    """Copy plotly.js next to index.html unless the same file is there."""
+    target = os.path.join(FRONTEND_DIR, "plotly.min.js")
+    if _file_stamp(target) == _file_stamp(PLOTLY_JS):
+        return
+    ##--- Copy under a private name so the component never serves half a file
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    shutil.copy2(PLOTLY_JS, tmp_path)
+    os.replace(tmp_path, target)
+
+
+_install_plotly_js()
+_component = components.declare_component("zoom_chart", path=FRONTEND_DIR)
+
+
+def _visible_window(view, start, end):
+    if not view or view.get("x0") is None:
+        return start, end
+    x0 = max(pd.Timestamp(view["x0"]), start)
+    x1 = min(pd.Timestamp(view["x1"]), end)
+    if x0 >= x1:
+        return start, end
+    return x0, x1
+
+
+def zoom_chart(fetch, start, end, key, height=450, title=None, y_title=None):
+    """Line chart that refetches its data when the user zooms or pans.
+
+    ``fetch(start, end, n_points)`` returns a frame indexed by time with one
+    column per trace, already reduced to about ``n_points`` rows. Only the
+    visible window, padded by half its width on each side for smooth
+    panning, is sent to the browser.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    view = st.session_state.get(key)
+    x0, x1 = _visible_window(view, start, end)
+    width = int((view or {}).get("width") or 1000)
+
+    pad = (x1 - x0) / 2
+    frame = fetch(max(start, x0 - pad), min(end, x1 + pad), 2 * width)
+
+    epoch_ms = frame.index.values.astype("datetime64[ms]").astype("int64")
+    payload = {
+        "traces": [
+            {
+                "name": str(column),
+                "x": epoch_ms.tolist(),
+                "y": np.round(frame[column].to_numpy(dtype=float), 3).tolist(),
+            }
+            for column in frame.columns
+        ],
+        "range": [x0.isoformat(), x1.isoformat()],
+        "bounds": [start.isoformat(), end.isoformat()],
+        "title": title,
+        "y_title": y_title,
+        "height": height,
+    }
+    _component(payload=payload, key=key, default=None)
@@ -0,0 +1,228 @@
+import os
+import glob
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from emona.baseline import SeasonalBaseline
+from emona.changepoint import CusumDetector
+from emona.forecast import FORECAST_REGRESSORS, SeasonalRegression
+from emona.io import (
+    DATA_PATH,
+    WEATHER_COLUMNS,
+    ZONE_COLUMNS,
+    read_power_consumption,
+)
+from emona.rollups import Rollups
+from emona.tariff import DEFAULT_TARIFF, TARIFFS, TariffIndex
+
+CACHE_DIR = "data/.cache"
+CACHE_VERSION = 3
+
+
+def _cache_path(path, mtime_ns):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{mtime_ns}-v{CACHE_VERSION}.parquet")
+
+
+def _write_parquet(data, path, cache_file):
+    ##--- Drop caches of older versions of the same source file
+    name = os.path.splitext(os.path.basename(path))[0]
+    for stale in glob.glob(os.path.join(CACHE_DIR, f"{name}-*.parquet")):
+        os.remove(stale)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_file = f"{cache_file}.tmp"
+    data.to_parquet(tmp_file)
+    os.replace(tmp_file, cache_file)
+
+
+@st.cache_resource(max_entries=1, show_spinner="Memuat data pemakaian...")
+def _load(path, mtime_ns):
+    cache_file = _cache_path(path, mtime_ns)
+
+    try:
+        return pd.read_parquet(cache_file)
+    except (ImportError, OSError):
+        pass
+
+    data = read_power_consumption(path)
+    try:
+        _write_parquet(data, path, cache_file)
+    except (ImportError, OSError):
+        ##--- No parquet engine or read-only disk: serve the parsed CSV as is
+        pass
+    return data
+
+
+def load_power_consumption(path=DATA_PATH):
+    """Return the shared power consumption frame.
+
+    The CSV is parsed once per process and mirrored to a Parquet file keyed on
+    the source mtime, so restarts read the columnar copy and an edited CSV is
+    picked up on the next rerun. Every session gets the same object: treat it
+    as read-only and ``.copy()`` before adding columns.
+
+    Rows are indexed by a sorted ``DatetimeIndex`` so time filters can use
+    the positional slices in ``emona.timeindex``.
+    """
+    return _load(path, os.stat(path).st_mtime_ns)
+
+
+def _checksum(data, rows=None):
+    """Fingerprint of the timestamps and readings of the first ``rows`` rows.
+
+    Appending rows leaves it unchanged; editing any earlier reading does not.
+    """
+    hashes = pd.util.hash_pandas_object(data.iloc[:rows], index=True)
+    return int(hashes.to_numpy().sum())
+
+
+def _extends(rows, checksum, data):
+    """True if ``data`` starts with exactly the ``rows`` rows hashed to ``checksum``."""
+    return rows <= len(data) and _checksum(data, rows) == checksum
+
+
+def _entry(value, data):
+    ##--- ``data`` is the frame ``value`` was last checked against
+    return {"value": value, "data": data, "checksum": _checksum(data)}
+
+
+@st.cache_resource
+def _rollup_store():
+    return {"lock": threading.Lock(), "rollups": {}}
+
+
+def load_rollups(path=DATA_PATH):
+    """Return the shared hourly/daily/monthly rollups of the power data.
+
+    When the CSV grows by appended rows only the new rows are folded into
+    the existing tables; if any earlier reading changed they are rebuilt.
+    """
+    data = load_power_consumption(path)
+    store = _rollup_store()
+    with store["lock"]:
+        entry = store["rollups"].get(path)
+        if entry is None or entry["data"] is not data:
+            rollups = entry and entry["value"]
+            if rollups is None or not _extends(rollups.rows, entry["checksum"], data):
+                rollups = Rollups(data)
+            elif rollups.rows < len(data):
+                rollups.append(data.iloc[rollups.rows :])
+            entry = _entry(rollups, data)
+            store["rollups"][path] = entry
+    return entry["value"]
+
+
+@st.cache_resource(max_entries=1, show_spinner="Menghitung baseline...")
+def _baseline(path, mtime_ns):
+    data = load_power_consumption(path)
+    return SeasonalBaseline(data.index, data)
+
+
+def load_baseline(path=DATA_PATH):
+    """Return the shared hour-of-week baseline of every column of the data.
+
+    Refitted only when the CSV changes.
+    """
+    return _baseline(path, os.stat(path).st_mtime_ns)
+
+
+@st.cache_resource
+def _changepoint_store():
+    return {"lock": threading.Lock(), "detectors": {}}
+
+
+def load_changepoints(path=DATA_PATH):
+    """Return the shared CUSUM detector of the zone columns, with its events.
+
+    Zones are compared with their hour-of-week baseline. Rows appended to
+    the CSV are scanned on their own, so history is never rescanned; if any
+    earlier reading changed the scan starts over.
+    """
+    data = load_power_consumption(path)
+    baseline = load_baseline(path)
+    store = _changepoint_store()
+    with store["lock"]:
+        entry = store["detectors"].get(path)
+        if entry is None or entry["data"] is not data:
+            detector = entry and entry["value"]
+            if detector is None or not _extends(detector.rows, entry["checksum"], data):
+                detector = CusumDetector(ZONE_COLUMNS)
+            if detector.rows < len(data):
+                rows = data.iloc[detector.rows :]
+                expected, scale = baseline.expected(rows.index, ZONE_COLUMNS)
+                detector.update(rows.index, rows[ZONE_COLUMNS], expected, scale)
+            entry = _entry(detector, data)
+            store["detectors"][path] = entry
+    return entry["value"]
+
+
+@st.cache_resource(max_entries=4)
+def _tariff_index(path, mtime_ns, tariff):
+    data = load_power_consumption(path)
+    zones = data[ZONE_COLUMNS].to_numpy(dtype="float64")
+    ##--- Readings are in W: energy of each interval in kWh
+    hours = pd.Series(data.index[:1000]).diff().median() / pd.Timedelta(hours=1)
+    return TariffIndex(TARIFFS[tariff], data.index, zones * hours / 1000)
+
+
+def load_tariff_index(path=DATA_PATH, tariff=DEFAULT_TARIFF):
+    """Return the shared per-band energy totals of the zone columns.
+
+    Costs of any range, per zone, are then two lookups. Rebuilt when the
+    CSV changes; each tariff keeps its own index.
+    """
+    return _tariff_index(path, os.stat(path).st_mtime_ns, tariff)
+
+
+def _model_path(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-forecast-v{CACHE_VERSION}.npz")
+
+
+def _read_model(path):
+    try:
+        model = SeasonalRegression.load(_model_path(path))
+    except (OSError, KeyError, ValueError):
+        return None
+    if model.targets != ZONE_COLUMNS or model.regressors != FORECAST_REGRESSORS:
+        return None
+    return model
+
+
+@st.cache_resource
+def _forecast_store():
+    return {"lock": threading.Lock(), "models": {}}
+
+
+def load_forecaster(path=DATA_PATH):
+    """Return the shared zone forecaster, fitted on every row of the CSV.
+
+    The fitted sums are saved under ``CACHE_DIR`` with a checksum of the
+    rows they came from, so a restart reads them back. Rows appended to the
+    CSV are folded in on their own; if any earlier reading changed the
+    model is refitted from scratch.
+    """
+    data = load_power_consumption(path)
+    store = _forecast_store()
+    with store["lock"]:
+        entry = store["models"].get(path)
+        if entry is None or entry["data"] is not data:
+            model = entry["value"] if entry else _read_model(path)
+            if model is None or not _extends(model.rows, model.checksum, data):
+                model = SeasonalRegression(ZONE_COLUMNS, FORECAST_REGRESSORS)
+            if model.rows < len(data):
+                rows = data.iloc[model.rows :]
+                model.update(rows.index, rows)
+                model.checksum = _checksum(data)
+                try:
+                    os.makedirs(CACHE_DIR, exist_ok=True)
+                    model.save(_model_path(path))
+                except OSError:
+                    ##--- Read-only disk: keep the model in memory only
+                    pass
+            entry = _entry(model, data)
+            store["models"][path] = entry
+    return entry["value"]
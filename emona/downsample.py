@@ -0,0 +1,89 @@
+import numpy as np
+
+##--- Enough points for a full-width chart on a large screen
+DEFAULT_POINTS = 1500
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype("datetime64[ns]").view("int64")
+    return values.astype("float64")
+
+
+def lttb_indices(x, y, n_out=DEFAULT_POINTS):
+    """Positions kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; in between, each bucket keeps
+    the point forming the largest triangle with the previous pick and the
+    mean of the next bucket, which preserves peaks and dips.
+    """
+    y = _as_float(y)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    next_edges = np.append(edges[1:], n)
+    counts = next_edges - edges
+    mean_x = np.add.reduceat(x, edges) / counts
+    mean_y = np.add.reduceat(y, edges) / counts
+
+    picked = np.empty(n_out, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], next_edges[i]
+        area = np.abs(
+            (x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def minmax_indices(y, n_out=DEFAULT_POINTS):
+    """Positions of the minimum and maximum of ``n_out // 2`` equal buckets."""
+    y = _as_float(y)
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    if n_out >= n:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    highs = offsets + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    picked = np.unique(np.concatenate([lows, highs]))
+    return picked[picked < n]
+
+
+def downsample_indices(x, y, n_out=DEFAULT_POINTS, keep=None, method="lttb"):
+    """Positions to plot so ``y`` fits in about ``n_out`` points.
+
+    Rows flagged in the boolean ``keep`` (anomalies, markers) are always
+    included on top of the budget. NaN rows are skipped.
+    """
+    y = _as_float(y)
+    finite = np.flatnonzero(np.isfinite(y))
+    if method == "minmax":
+        picked = finite[minmax_indices(y[finite], n_out)]
+    else:
+        picked = finite[lttb_indices(np.asarray(x)[finite], y[finite], n_out)]
+    if keep is not None:
+        picked = np.union1d(picked, np.flatnonzero(np.asarray(keep)))
+    return picked
+
+
+def downsample_frame(frame, y, x=None, n_out=DEFAULT_POINTS, keep=None, method="lttb"):
+    """Rows of ``frame`` to plot for column ``y``, against the index or ``x``."""
+    x_values = frame.index if x is None else frame[x]
+    picked = downsample_indices(
+        x_values.to_numpy(), frame[y].to_numpy(), n_out, keep, method
+    )
+    return frame.iloc[picked]
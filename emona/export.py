@@ -0,0 +1,296 @@
+import hashlib
+import os
+import re
+import html
+import tempfile
+import time
+import urllib.parse
+import uuid
+
+import pandas as pd
+import streamlit as st
+
+##--- Served by Streamlit's static route (server.enableStaticServing) at
+##--- app/static/exports/, so downloads never pass through the session
+STATIC_DIR = "static"
+EXPORT_DIR = os.path.join(STATIC_DIR, "exports")
+##--- Streamlit's static route refuses larger files
+STATIC_MAX_BYTES = 200 * 1024 * 1024
+CHUNK_ROWS = 50_000
+##--- Files unused for this long are removed when a new one is written
+MAX_AGE_SECONDS = 24 * 3600
+##--- Data rows per worksheet: Excel stops at 1,048,576 rows with the header
+XLSX_MAX_ROWS = 1_048_575
+XLSX_EPOCH = pd.Timestamp("1899-12-30")
+
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "Excel": (
+        ".xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+}
+
+
+def _sheet(spec):
+    """``(frame, columns)`` of a sheet given as a frame or such a pair."""
+    if isinstance(spec, pd.DataFrame):
+        return spec, None
+    return spec
+
+
+def _chunks(spec, chunk):
+    """Rows of a sheet, ``chunk`` at a time; a named index becomes a column.
+
+    Only one chunk of the selected columns is copied at a time. An empty
+    sheet still yields one empty chunk so its header gets written.
+    """
+    frame, columns = _sheet(spec)
+    for start in range(0, max(len(frame), 1), chunk):
+        part = frame.iloc[start : start + chunk]
+        if columns is not None:
+            part = part[columns]
+        if part.index.name is not None:
+            part = part.reset_index()
+        yield part
+
+
+def _single(sheets):
+    if len(sheets) != 1:
+        raise ValueError("CSV and Parquet exports hold a single sheet")
+    return next(iter(sheets.values()))
+
+
+def _write_csv(path, sheets, chunk):
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        for i, part in enumerate(_chunks(_single(sheets), chunk)):
+            part.to_csv(out, header=i == 0, index=False)
+
+
+def _write_parquet(path, sheets, chunk):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for part in _chunks(_single(sheets), chunk):
+            if writer is None:
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                writer = pq.ParquetWriter(path, table.schema)
+            else:
+                table = pa.Table.from_pandas(
+                    part, schema=writer.schema, preserve_index=False
+                )
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _sheet_names(names):
+    """Valid, distinct worksheet names: no ``[]:*?/\\``, at most 31 chars."""
+    used = set()
+    for name in names:
+        base = re.sub(r"[\[\]:*?/\\]", "_", str(name))[:31] or "Sheet"
+        unique, n = base, 1
+        while unique.lower() in used:
+            n += 1
+            unique = f"{base[:31 - len(str(n)) - 3]} ({n})"
+        used.add(unique.lower())
+        yield unique
+
+
+def _columns(part):
+    """Each column as a list Excel can take, and how to write its cells."""
+    cells = []
+    for column in part.columns:
+        values = part[column]
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            values = values.dt.tz_localize(None)
+        if pd.api.types.is_datetime64_any_dtype(values):
+            ##--- Excel dates are days since its epoch
+            cells.append(((values - XLSX_EPOCH) / pd.Timedelta(days=1), "date"))
+        elif pd.api.types.is_bool_dtype(values):
+            cells.append((values, "boolean"))
+        elif values.dtype == "float32":
+            ##--- Through the shortest repr, so 0.1 is not written 0.100000001
+            cells.append((values.astype(str).astype("float64"), "number"))
+        elif pd.api.types.is_numeric_dtype(values):
+            cells.append((values.astype("float64"), "number"))
+        else:
+            cells.append((values.astype(object).where(values.notna()), "string"))
+    return [(values.to_numpy(dtype=object).tolist(), kind) for values, kind in cells]
+
+
+def _add_worksheet(workbook, title, columns):
+    worksheet = workbook.add_worksheet(title)
+    worksheet.write_row(0, 0, [str(column) for column in columns])
+    worksheet.set_column(0, max(len(columns) - 1, 0), 16)
+    return worksheet
+
+
+def _write_xlsx(path, sheets, chunk):
+    import xlsxwriter
+
+    ##--- constant_memory flushes each row to disk once the next one starts
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    try:
+        for name, spec in zip(_sheet_names(sheets), sheets.values()):
+            worksheet, row, page = None, 1, 1
+            for part in _chunks(spec, chunk):
+                if worksheet is None:
+                    worksheet = _add_worksheet(workbook, name, part.columns)
+                columns = _columns(part)
+                for values in zip(*(values for values, _ in columns)):
+                    if row > XLSX_MAX_ROWS:
+                        ##--- Rows past Excel's limit go on a continuation sheet
+                        page += 1
+                        worksheet = _add_worksheet(
+                            workbook, f"{name[:25]} ({page})", part.columns
+                        )
+                        row = 1
+                    for col, (value, (_, kind)) in enumerate(zip(values, columns)):
+                        if value is None or value != value:
+                            continue
+                        if kind == "date":
+                            worksheet.write_number(row, col, value, date_format)
+                        elif kind == "number":
+                            worksheet.write_number(row, col, value)
+                        elif kind == "boolean":
+                            worksheet.write_boolean(row, col, value)
+                        else:
+                            worksheet.write_string(row, col, str(value))
+                    row += 1
+    finally:
+        workbook.close()
+
+
+WRITERS = {"CSV": _write_csv, "Parquet": _write_parquet, "Excel": _write_xlsx}
+
+
+def _drop_stale():
+    cutoff = time.time() - MAX_AGE_SECONDS
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def export_file(name, fmt, key, build, chunk=CHUNK_ROWS):
+    """Path of the ``fmt`` export of ``build()``, written once per ``key``.
+
+    ``build`` returns a dict of sheet name to frame, or to a
+    ``(frame, columns)`` pair so a sheet can take a few columns of a shared
+    frame without copying it. CSV and Parquet take one sheet; Excel writes
+    one worksheet each. Rows are streamed ``chunk`` at a time into a temp
+    file, so memory stays bounded whatever the export size, and the file is
+    reused by every session asking for the same ``key``. ``key`` must change
+    whenever the exported data does.
+    """
+    extension = FORMATS[fmt][0]
+    digest = hashlib.sha1(repr((name, fmt, key)).encode()).hexdigest()[:16]
+    path = os.path.join(EXPORT_DIR, f"{name}-{digest}{extension}")
+    try:
+        ##--- Reuse counts as use for the age limit
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _drop_stale()
+    ##--- Write under a private name so concurrent sessions never see a half file
+    handle, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=EXPORT_DIR)
+    os.close(handle)
+    try:
+        WRITERS[fmt](tmp_path, build(), chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _download_link(container, path, file_name, label):
+    url = "app/static/" + urllib.parse.quote(
+        os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
+    )
+    container.markdown(
+        f'<a href="{url}" download="{html.escape(file_name)}" '
+        'style="display:inline-block; padding:0.25rem 0.75rem; '
+        "border:1px solid rgba(49, 51, 63, 0.2); border-radius:0.5rem; "
+        f'color:inherit; text-decoration:none;">{html.escape(label)}</a>',
+        unsafe_allow_html=True,
+    )
+
+
+def download_export(
+    container,
+    name,
+    fmt,
+    key,
+    build,
+    file_name,
+    label,
+    download_label,
+    replace=False,
+):
+    """``label`` button that turns into a download link for the export.
+
+    The file is only written after the button is pressed, and stays
+    prepared in this session while ``fmt`` and ``key`` do not change. The
+    browser fetches it from the static route, so reruns never read it
+    back; without static serving, or past its size limit, it falls back to
+    ``st.download_button``. With ``replace`` the file this session prepared
+    before is removed, for exports whose ``key`` changes on every update;
+    such files are private to the session, so no other session is left
+    with a link to a removed file.
+    """
+    state_key = f"export_{name}"
+    if replace:
+        key = (st.session_state.setdefault("export_session", uuid.uuid4().hex), key)
+    slot = container.empty()
+    prepared = st.session_state.get(state_key)
+    if replace and prepared is not None and not os.path.exists(prepared[2]):
+        ##--- Removed as stale: build() no longer returns the data of its key
+        prepared = None
+    if prepared is None or prepared[:2] != (fmt, key):
+        if not slot.button(label, key=f"{state_key}_prepare"):
+            return
+        with st.spinner():
+            path = export_file(name, fmt, key, build)
+        if replace and prepared is not None and prepared[2] != path:
+            _remove(prepared[2])
+        st.session_state[state_key] = (fmt, key, path)
+    else:
+        path = prepared[2]
+        if not os.path.exists(path):
+            ##--- Removed as stale while still shown: write it again
+            with st.spinner():
+                path = export_file(name, fmt, key, build)
+
+    extension, mime = FORMATS[fmt]
+    if st.get_option("server.enableStaticServing") and (
+        os.path.getsize(path) <= STATIC_MAX_BYTES
+    ):
+        _download_link(slot, path, f"{file_name}{extension}", download_label)
+        return
+    with open(path, "rb") as file:
+        slot.download_button(
+            download_label,
+            file,
+            file_name=f"{file_name}{extension}",
+            mime=mime,
+            key=f"{state_key}_download",
+        )
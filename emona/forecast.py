@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from emona.baseline import hour_of_week
+from emona.timeindex import HOURS_PER_WEEK
+
+##--- Weather columns of powerconsumption.csv used as regressors
+FORECAST_REGRESSORS = ["Temperature", "Humidity", "WindSpeed"]
+
+
+def _slot_sums(slots, values):
+    """Sum of every column of ``values`` per hour-of-week slot."""
+    sums = np.zeros((HOURS_PER_WEEK, values.shape[1]))
+    for i, column in enumerate(values.T):
+        sums[:, i] = np.bincount(slots, weights=column, minlength=HOURS_PER_WEEK)
+    return sums
+
+
+class SeasonalRegression:
+    """Hour-of-week plus weather linear model of several series at once.
+
+    Each target is modelled as a level per hour of the week (hour of day by
+    day of week) plus a linear term per regressor. All targets share the
+    design matrix, so the normal equations ``X'X`` and ``X'Y`` are built
+    once for every zone and solved with one least-squares call. The
+    hour-of-week block of ``X`` is one-hot, so both are assembled from
+    per-slot sums instead of a dense product. ``update`` adds new rows to
+    the sums and solves again: refitting on appended data only reads them.
+    """
+
+    def __init__(self, targets, regressors=(), ridge=1e-6):
+        self.targets = list(targets)
+        self.regressors = list(regressors)
+        self.ridge = ridge
+        p = HOURS_PER_WEEK + len(self.regressors)
+        self.xtx = np.zeros((p, p))
+        self.xty = np.zeros((p, len(self.targets)))
+        self.coef = np.zeros((p, len(self.targets)))
+        self.rows = 0
+        ##--- Fingerprint of the fitted rows, set by the caller and saved with
+        ##--- the model so a changed source can be told from an appended one
+        self.checksum = 0
+
+    def update(self, timestamps, frame):
+        """Fold rows of ``frame`` (targets and regressors) in and refit.
+
+        Rows with a NaN target or regressor are skipped.
+        """
+        index = pd.DatetimeIndex(timestamps)
+        if len(index) == 0:
+            return self
+        y = frame[self.targets].to_numpy(dtype="float64")
+        w = frame[self.regressors].to_numpy(dtype="float64").reshape(len(y), -1)
+        keep = ~(np.isnan(y).any(axis=1) | np.isnan(w).any(axis=1))
+        slots = hour_of_week(index)[keep]
+        y, w = y[keep], w[keep]
+
+        k = HOURS_PER_WEEK
+        self.xtx[np.arange(k), np.arange(k)] += np.bincount(slots, minlength=k)
+        slot_w = _slot_sums(slots, w)
+        self.xtx[:k, k:] += slot_w
+        self.xtx[k:, :k] += slot_w.T
+        self.xtx[k:, k:] += w.T @ w
+        self.xty[:k] += _slot_sums(slots, y)
+        self.xty[k:] += w.T @ y
+
+        self.rows += len(index)
+        self._solve()
+        return self
+
+    def _solve(self):
+        ##--- A small ridge keeps hours of the week never seen at zero
+        system = self.xtx + self.ridge * np.eye(len(self.xtx))
+        self.coef = np.linalg.lstsq(system, self.xty, rcond=None)[0]
+
+    def predict(self, timestamps, weather=None):
+        """``(rows, targets)`` predictions; ``weather`` aligned with them."""
+        prediction = self.coef[hour_of_week(timestamps)]
+        if self.regressors:
+            w = np.asarray(weather, dtype="float64").reshape(len(prediction), -1)
+            prediction = prediction + w @ self.coef[HOURS_PER_WEEK:]
+        return prediction
+
+    def save(self, path):
+        tmp_file = f"{path}.tmp.npz"
+        np.savez(
+            tmp_file,
+            targets=np.array(self.targets),
+            regressors=np.array(self.regressors, dtype=str),
+            ridge=self.ridge,
+            xtx=self.xtx,
+            xty=self.xty,
+            rows=self.rows,
+            checksum=np.uint64(self.checksum),
+        )
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as saved:
+            model = cls(saved["targets"].tolist(), saved["regressors"].tolist())
+            model.ridge = float(saved["ridge"])
+            model.xtx = saved["xtx"]
+            model.xty = saved["xty"]
+            model.rows = int(saved["rows"])
+            model.checksum = int(saved["checksum"])
+        model._solve()
+        return model
+
+
+def weather_profile(timestamps, weather, weeks=4):
+    """Mean of each weather column per hour of the week over the last weeks.
+
+    Stands in for a weather forecast: ``profile[hour_of_week(future)]``.
+    """
+    index = pd.DatetimeIndex(timestamps)
+    values = np.asarray(weather, dtype="float64").reshape(len(index), -1)
+    recent = index >= index[-1] - pd.Timedelta(weeks=weeks)
+    slots = hour_of_week(index[recent])
+    values = values[recent]
+    valid = ~np.isnan(values)
+    counts = _slot_sums(slots, valid.astype("float64"))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profile = _slot_sums(slots, np.where(valid, values, 0.0)) / counts
+    ##--- Hours of the week missing from the window take the overall mean
+    return np.where(counts > 0, profile, np.nanmean(values, axis=0))
+
+
+def future_index(timestamps, horizon):
+    """Timestamps after the last one, at the same step, covering ``horizon``."""
+    index = pd.DatetimeIndex(timestamps)
+    step = pd.Series(index[:1000]).diff().median()
+    return pd.date_range(index[-1] + step, index[-1] + horizon, freq=step)
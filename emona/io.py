@@ -0,0 +1,30 @@
+import pandas as pd
+
+DATA_PATH = "data/powerconsumption.csv"
+
+ZONE_COLUMNS = [
+    "PowerConsumption_Zone1",
+    "PowerConsumption_Zone2",
+    "PowerConsumption_Zone3",
+]
+WEATHER_COLUMNS = [
+    "Temperature",
+    "Humidity",
+    "WindSpeed",
+    "GeneralDiffuseFlows",
+    "DiffuseFlows",
+]
+
+
+def read_power_consumption(path=DATA_PATH):
+    """Parse the power consumption CSV into a frame sorted by time.
+
+    Rows are indexed by a ``DatetimeIndex`` named ``Datetime``. This reads
+    the file on every call: the app goes through ``emona.data``, which
+    caches it; offline tools such as the backtest call this directly.
+    """
+    data = pd.read_csv(path)
+    timestamps = pd.to_datetime(data.pop("Datetime"))
+    data.index = pd.DatetimeIndex(timestamps, name="Datetime")
+    data = data.astype("float64")
+    return data.sort_index(kind="stable")
@@ -0,0 +1,390 @@
+"""Modbus/TCP acquisition for the live motor pages.
+
+Channels are mapped to registers in ``data/channels.csv``. The engine keeps
+a small pool of persistent connections per gateway, reads every contiguous
+register range of a gateway in one request, and backs off from a gateway
+that times out without holding up the others.
+
+Run ``python -m emona.modbus`` to start a local register simulator for
+offline testing.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CHANNELS_PATH = "data/channels.csv"
+
+READ_HOLDING_REGISTERS = 3
+READ_INPUT_REGISTERS = 4
+MAX_REGISTERS = 125
+
+##--- Register width and numpy dtype (big-endian, high word first)
+DTYPES = {
+    "u16": (1, ">u2"),
+    "i16": (1, ">i2"),
+    "u32": (2, ">u4"),
+    "i32": (2, ">i4"),
+    "f32": (2, ">f4"),
+}
+
+Channel = namedtuple(
+    "Channel", ["tag", "gateway", "unit", "function", "address", "dtype", "scale"]
+)
+Batch = namedtuple(
+    "Batch", ["gateway", "unit", "function", "address", "count", "members"]
+)
+
+
+class ModbusError(Exception):
+    pass
+
+
+def load_channels(path=CHANNELS_PATH):
+    table = pd.read_csv(path, dtype={"gateway": str, "dtype": str})
+    table = table.fillna(
+        {"function": READ_HOLDING_REGISTERS, "dtype": "u16", "scale": 1.0}
+    )
+    return [
+        Channel(
+            row.tag,
+            row.gateway,
+            int(row.unit),
+            int(row.function),
+            int(row.address),
+            row.dtype,
+            float(row.scale),
+        )
+        for row in table.itertuples(index=False)
+    ]
+
+
+def plan_batches(channels, max_registers=MAX_REGISTERS, max_gap=8):
+    """Group channels into as few contiguous register reads as possible.
+
+    Channels on the same gateway, unit and function code are merged into one
+    read while the span stays under ``max_registers`` and the hole between
+    neighbours is at most ``max_gap`` registers. Each member is
+    ``(channel_position, register_offset, dtype, scale)``.
+    """
+    order = sorted(
+        range(len(channels)),
+        key=lambda i: (
+            channels[i].gateway,
+            channels[i].unit,
+            channels[i].function,
+            channels[i].address,
+        ),
+    )
+    batches = []
+    current = None
+    for i in order:
+        channel = channels[i]
+        width = DTYPES[channel.dtype][0]
+        key = (channel.gateway, channel.unit, channel.function)
+        if current is not None:
+            end = current["address"] + current["count"]
+            fits = channel.address + width - current["address"] <= max_registers
+            if current["key"] == key and channel.address - end <= max_gap and fits:
+                current["count"] = (
+                    max(end, channel.address + width) - current["address"]
+                )
+                current["members"].append(
+                    (
+                        i,
+                        channel.address - current["address"],
+                        channel.dtype,
+                        channel.scale,
+                    )
+                )
+                continue
+            batches.append(current)
+        current = {
+            "key": key,
+            "address": channel.address,
+            "count": width,
+            "members": [(i, 0, channel.dtype, channel.scale)],
+        }
+    if current is not None:
+        batches.append(current)
+
+    return [
+        Batch(*batch["key"], batch["address"], batch["count"], batch["members"])
+        for batch in batches
+    ]
+
+
+def decode(registers, members, out):
+    """Write the scaled value of each batch member into ``out``."""
+    raw = registers.tobytes()
+    for position, offset, dtype, scale in members:
+        width, np_dtype = DTYPES[dtype]
+        start = 2 * offset
+        value = np.frombuffer(raw[start : start + 2 * width], dtype=np_dtype)[0]
+        out[position] = float(value) * scale
+
+
+def split_gateway(gateway):
+    host, _, port = gateway.rpartition(":")
+    return host, int(port or 502)
+
+
+class _Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.transaction = 0
+
+    async def request(self, unit, function, address, count, timeout):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), timeout
+            )
+
+        self.transaction = (self.transaction + 1) % 0x10000
+        self.writer.write(
+            struct.pack(
+                ">HHHBBHH", self.transaction, 0, 6, unit, function, address, count
+            )
+        )
+        ##--- A gateway that stops reading fills the send buffer: bound the wait
+        await asyncio.wait_for(self.writer.drain(), timeout)
+
+        header = await asyncio.wait_for(self.reader.readexactly(7), timeout)
+        transaction, _, length, _ = struct.unpack(">HHHB", header)
+        if length < 3:
+            raise ModbusError(f"length {length} too short from unit {unit}")
+        pdu = await asyncio.wait_for(self.reader.readexactly(length - 1), timeout)
+        if transaction != self.transaction:
+            raise ModbusError(f"transaction {transaction} != {self.transaction}")
+        if pdu[0] & 0x80:
+            raise ModbusError(f"exception code {pdu[1]} from unit {unit}")
+        ##--- A short or malformed answer must fail here, as a gateway failure,
+        ##--- not later while decoding
+        if pdu[1] != 2 * count or len(pdu) < 2 + pdu[1]:
+            raise ModbusError(f"{pdu[1]} bytes for {count} registers from unit {unit}")
+        return np.frombuffer(pdu[2 : 2 + pdu[1]], dtype=">u2")
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class GatewayPool:
+    """Persistent connections to one gateway, handed out one request at a time."""
+
+    def __init__(self, gateway, size=2):
+        host, port = split_gateway(gateway)
+        self.gateway = gateway
+        self._idle = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(_Connection(host, port))
+
+    async def request(self, unit, function, address, count, timeout):
+        connection = await self._idle.get()
+        try:
+            return await connection.request(unit, function, address, count, timeout)
+        except BaseException:
+            ##--- A failed exchange leaves the stream in an unknown state
+            connection.close()
+            raise
+        finally:
+            self._idle.put_nowait(connection)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class AcquisitionEngine:
+    """Poll every channel once per call to ``poll()``.
+
+    Gateways are polled concurrently. A gateway that fails is skipped with
+    exponential backoff and its channels read as NaN until it answers again.
+    """
+
+    def __init__(
+        self,
+        channels,
+        timeout=0.5,
+        pool_size=2,
+        backoff=1.0,
+        max_backoff=30.0,
+    ):
+        self.channels = list(channels)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batches = {}
+        for batch in plan_batches(self.channels):
+            self.batches.setdefault(batch.gateway, []).append(batch)
+        self._pools = {}
+        self._failures = {gateway: 0 for gateway in self.batches}
+        self._retry_at = {gateway: 0.0 for gateway in self.batches}
+        self._loop = None
+
+    async def _poll_gateway(self, gateway, out):
+        if time.monotonic() < self._retry_at[gateway]:
+            return
+        pool = self._pools.get(gateway)
+        if pool is None:
+            pool = self._pools[gateway] = GatewayPool(gateway, self.pool_size)
+
+        batches = self.batches[gateway]
+        results = await asyncio.gather(
+            *(
+                pool.request(
+                    batch.unit, batch.function, batch.address, batch.count, self.timeout
+                )
+                for batch in batches
+            ),
+            return_exceptions=True,
+        )
+
+        failed = False
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                failed = True
+                logger.warning("Modbus read from %s failed: %r", gateway, result)
+            else:
+                decode(result, batch.members, out)
+
+        if failed:
+            self._failures[gateway] += 1
+            delay = self.backoff * 2 ** (self._failures[gateway] - 1)
+            self._retry_at[gateway] = time.monotonic() + min(delay, self.max_backoff)
+        else:
+            self._failures[gateway] = 0
+
+    async def poll(self):
+        out = np.full(len(self.channels), np.nan)
+        await asyncio.gather(
+            *(self._poll_gateway(gateway, out) for gateway in self.batches)
+        )
+        return out
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=self._loop.run_forever, name="emona-modbus", daemon=True
+            ).start()
+        return self._loop
+
+    async def _shutdown(self):
+        for pool in self._pools.values():
+            pool.close()
+        self._pools = {}
+        ##--- Closed connections end the simulators' handlers: let them finish
+        tasks = asyncio.all_tasks() - {asyncio.current_task()}
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=self.timeout)
+            for task in pending:
+                task.cancel()
+
+    def close(self):
+        """Close every gateway connection and stop the event loop thread."""
+        if self._loop is None:
+            return
+        self.submit(self._shutdown()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    def submit(self, coroutine):
+        """Run ``coroutine`` on the engine's event loop thread."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def sampler(self, tags):
+        """Blocking callable returning one reading per tag, NaN if unmapped."""
+        positions = {channel.tag: i for i, channel in enumerate(self.channels)}
+        take = np.array([positions.get(tag, -1) for tag in tags])
+
+        def sample():
+            values = self.submit(self.poll()).result()
+            return np.where(take >= 0, values[take], np.nan)
+
+        return sample
+
+
+class Simulator:
+    """Minimal Modbus/TCP server answering function codes 3 and 4.
+
+    Every register follows its own slow sine wave around ``base`` so gauges
+    move like a running motor.
+    """
+
+    def __init__(self, base=2500, amplitude=2000, period=60.0):
+        self.base = base
+        self.amplitude = amplitude
+        self.period = period
+
+    def value(self, unit, address):
+        phase = (
+            2 * math.pi * (time.time() / self.period + 0.137 * (unit * 1000 + address))
+        )
+        noise = random.uniform(-0.05, 0.05) * self.amplitude
+        return int(self.base + self.amplitude * math.sin(phase) + noise) & 0xFFFF
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                transaction, protocol, length, unit = struct.unpack(">HHHB", header)
+                pdu = await reader.readexactly(length - 1)
+                function = pdu[0]
+                if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+                    address, count = struct.unpack(">HH", pdu[1:5])
+                    values = [self.value(unit, address + i) for i in range(count)]
+                    body = struct.pack(f">BB{count}H", function, 2 * count, *values)
+                else:
+                    body = struct.pack(">BB", function | 0x80, 1)
+                writer.write(
+                    struct.pack(">HHHB", transaction, protocol, len(body) + 1, unit)
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=5020):
+        """Bind and start accepting connections; returns the server."""
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def serve(self, host="127.0.0.1", port=5020):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Modbus/TCP simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    args = parser.parse_args()
+
+    print(f"Serving simulated registers on {args.host}:{args.port}")
+    try:
+        asyncio.run(Simulator().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MOTORS_PATH = "data/motors.csv"
+
+
+class MotorRegistry:
+    """Motors from the registry file, grouped by section in file order.
+
+    Readings are passed around as one array aligned with ``tags`` so that
+    per-section totals are a single ``bincount`` instead of a loop per motor.
+    """
+
+    def __init__(self, table):
+        self.table = table.reset_index(drop=True)
+        self.tags = tuple(self.table["tag"])
+        codes, self.sections = pd.factorize(self.table["section"], sort=False)
+        self.section_codes = codes
+        self.positions = {
+            section: np.flatnonzero(codes == i)
+            for i, section in enumerate(self.sections)
+        }
+
+    def __len__(self):
+        return len(self.tags)
+
+    def motors(self, section):
+        return self.table.iloc[self.positions[section]]
+
+    def section_totals(self, readings):
+        """Sum ``readings`` per section, in ``self.sections`` order."""
+        return np.bincount(
+            self.section_codes,
+            weights=np.nan_to_num(readings),
+            minlength=len(self.sections),
+        )
+
+
+@st.cache_resource(max_entries=1)
+def _load_registry(path, mtime_ns):
+    return MotorRegistry(pd.read_csv(path))
+
+
+def load_motor_registry(path=MOTORS_PATH):
+    """Shared registry, reloaded when the file changes."""
+    return _load_registry(path, os.stat(path).st_mtime_ns)
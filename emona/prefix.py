@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from emona.timeindex import HOURS_PER_WEEK, calendar_keys, time_bounds
+
+
+class PrefixIndex:
+    """Running totals of a time-sorted frame for constant-time range sums.
+
+    Row ``k`` of the cumulative tables holds the total of rows ``0..k-1``, so
+    the sum over positions ``[i, j)`` is ``cum[j] - cum[i]`` whatever the
+    range length. NaN readings are left out of both sums and counts.
+    """
+
+    def __init__(self, timestamps, frame):
+        self.index = pd.DatetimeIndex(timestamps)
+        self.columns = list(frame.columns)
+        self.step = pd.Series(self.index[:1000]).diff().median()
+
+        values = frame.to_numpy(dtype="float64")
+        valid = ~np.isnan(values)
+        zeros = np.zeros((1, len(self.columns)))
+        self._sums = np.vstack([zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+        self._counts = np.vstack([zeros, np.cumsum(valid, axis=0)])
+
+    def bounds(self, start, end):
+        return time_bounds(self.index, start, end)
+
+    def sums(self, i, j):
+        return pd.Series(self._sums[j] - self._sums[i], index=self.columns)
+
+    def counts(self, i, j):
+        return pd.Series(self._counts[j] - self._counts[i], index=self.columns)
+
+    def means(self, i, j):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sums(i, j) / self.counts(i, j)
+
+    def previous(self, i, j):
+        """Positions of the window of equal duration just before ``[i, j)``."""
+        if j <= i:
+            return i, i
+        first, last = self.index[i], self.index[j - 1]
+        previous_end = first - self.step
+        return self.bounds(previous_end - (last - first), previous_end)
+
+
+class WeekHourIndex:
+    """Day-of-week by hour sums and counts of one series, per calendar day.
+
+    Row ``d`` of the cumulative tables holds the 7x24 cell totals of days
+    ``0..d-1``, so the cells of any run of whole days cost one subtraction;
+    partial days at either end of a range are added from their own rows.
+    ``append`` folds newly ingested rows in without rebuilding the tables.
+    """
+
+    def __init__(self, timestamps, values):
+        self.index = pd.DatetimeIndex([])
+        self.first_day = None
+        self._day = np.empty(0, dtype="int64")
+        self._slot = np.empty(0, dtype="int64")
+        self._values = np.empty(0)
+        self._sums = np.zeros((1, HOURS_PER_WEEK))
+        self._counts = np.zeros((1, HOURS_PER_WEEK))
+        self.append(timestamps, values)
+
+    def append(self, timestamps, values):
+        index = pd.DatetimeIndex(timestamps)
+        if len(index) == 0:
+            return
+        keys = calendar_keys(index)
+        if self.first_day is None:
+            self.first_day = int(keys["day"].iloc[0])
+        day = keys["day"].to_numpy("int64") - self.first_day
+        slot = keys["day_of_week"].to_numpy("int64") * 24 + keys["hour"].to_numpy(
+            "int64"
+        )
+        values = np.asarray(values, dtype="float64")
+        valid = ~np.isnan(values)
+
+        ##--- The last stored day may still be filling up: redo it with the new rows
+        base = max(len(self._sums) - 2, 0)
+        days = day[-1] + 1 - base
+        cells = (day - base) * HOURS_PER_WEEK + slot
+        size = days * HOURS_PER_WEEK
+        sums = np.bincount(cells, np.where(valid, values, 0.0), size).reshape(days, -1)
+        counts = np.bincount(cells, valid, size).reshape(days, -1)
+        if base + 1 < len(self._sums):
+            sums[0] += self._sums[base + 1] - self._sums[base]
+            counts[0] += self._counts[base + 1] - self._counts[base]
+        self._sums = np.vstack(
+            [self._sums[: base + 1], self._sums[base] + sums.cumsum(0)]
+        )
+        self._counts = np.vstack(
+            [self._counts[: base + 1], self._counts[base] + counts.cumsum(0)]
+        )
+
+        self.index = self.index.append(index)
+        self._day = np.concatenate([self._day, day])
+        self._slot = np.concatenate([self._slot, slot])
+        self._values = np.concatenate([self._values, values])
+
+    def bounds(self, start, end):
+        return time_bounds(self.index, start, end)
+
+    def cells(self, i, j):
+        """``(sums, counts)`` of rows ``[i, j)``, each shaped ``(7, 24)``."""
+        sums = np.zeros(HOURS_PER_WEEK)
+        counts = np.zeros(HOURS_PER_WEEK)
+        if j > i:
+            day_start = np.searchsorted(self._day, np.arange(len(self._sums)))
+            first = self._day[i] + (day_start[self._day[i]] != i)
+            last = self._day[j - 1] + 1
+            last -= day_start[last] != j
+            if first < last:
+                sums += self._sums[last] - self._sums[first]
+                counts += self._counts[last] - self._counts[first]
+                edges = np.r_[i : day_start[first], day_start[last] : j]
+            else:
+                edges = np.arange(i, j)
+
+            values = self._values[edges]
+            valid = ~np.isnan(values)
+            slots = self._slot[edges]
+            sums += np.bincount(slots, np.where(valid, values, 0.0), HOURS_PER_WEEK)
+            counts += np.bincount(slots, valid, HOURS_PER_WEEK)
+        return sums.reshape(7, 24), counts.reshape(7, 24)
+
+    def means(self, i, j):
+        """Mean of each day-of-week by hour cell over rows ``[i, j)``."""
+        sums, counts = self.cells(i, j)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+from emona.downsample import downsample_frame
+from emona.timeindex import slice_range
+
+##--- Finest to coarsest, with the widest bucket each tier can hold
+TIERS = {
+    "hourly": ("h", pd.Timedelta(hours=1)),
+    "daily": ("D", pd.Timedelta(days=1)),
+    "monthly": ("MS", pd.Timedelta(days=31)),
+}
+STATS = ["sum", "mean", "min", "max", "count"]
+
+
+def _aggregate(frame, freq):
+    table = frame.astype("float64").resample(freq).agg(["sum", "min", "max", "count"])
+    for column in frame.columns:
+        table[(column, "mean")] = table[(column, "sum")] / table[(column, "count")]
+    return table[[(column, stat) for column in frame.columns for stat in STATS]]
+
+
+def _merge(old, new):
+    merged = old.copy()
+    columns = old.columns.get_level_values(0).unique()
+    for column in columns:
+        merged[(column, "sum")] += new[(column, "sum")]
+        merged[(column, "count")] += new[(column, "count")]
+        merged[(column, "min")] = np.fmin(old[(column, "min")], new[(column, "min")])
+        merged[(column, "max")] = np.fmax(old[(column, "max")], new[(column, "max")])
+        merged[(column, "mean")] = merged[(column, "sum")] / merged[(column, "count")]
+    return merged
+
+
+class Rollups:
+    """Hourly, daily and monthly aggregates of every column of a time frame.
+
+    Each table has ``(column, stat)`` columns with ``stat`` in ``STATS``.
+    Rows must arrive in time order; ``append`` folds new rows into the
+    existing buckets instead of rebuilding the tables.
+    """
+
+    def __init__(self, frame):
+        self.columns = list(frame.columns)
+        self.step = pd.Series(frame.index[:1000]).diff().median()
+        self.rows = len(frame)
+        self.tables = {
+            tier: _aggregate(frame, freq) for tier, (freq, _) in TIERS.items()
+        }
+
+    def append(self, rows):
+        if rows.empty:
+            return
+        tables = {}
+        for tier, (freq, _) in TIERS.items():
+            table = self.tables[tier]
+            new = _aggregate(rows[self.columns], freq)
+            overlap = new.index.intersection(table.index)
+            if len(overlap):
+                table = table.copy()
+                table.loc[overlap] = _merge(table.loc[overlap], new.loc[overlap])
+                new = new.drop(overlap)
+            tables[tier] = pd.concat([table, new]).sort_index()
+
+        ##--- Swap in one go so concurrent readers never see a half update
+        self.tables = tables
+        self.rows += len(rows)
+
+    def table(self, tier, stat=None):
+        table = self.tables[tier]
+        if stat is None:
+            return table
+        return table.xs(stat, axis=1, level=1)
+
+    def select(self, start, end, max_points):
+        """Finest tier, or ``"raw"``, that draws ``[start, end]`` in
+        at most ``max_points`` buckets."""
+        span = pd.Timestamp(end) - pd.Timestamp(start)
+        if span / self.step <= max_points:
+            return "raw"
+        for tier, (_, width) in TIERS.items():
+            if span / width <= max_points:
+                return tier
+        return "monthly"
+
+    def window(self, tier, start, end, stat="mean"):
+        return slice_range(self.table(tier, stat), start, end)
+
+
+def fetch_window(data, rollups, columns, start, end, n_points):
+    """``columns`` between ``start`` and ``end`` in about ``n_points`` rows.
+
+    Reads raw rows when the window is short enough and the matching rollup
+    mean otherwise, then downsamples on the first column.
+    """
+    tier = rollups.select(start, end, max_points=10 * n_points)
+    if tier == "raw":
+        frame = slice_range(data, start, end)
+    else:
+        frame = rollups.window(tier, start, end)
+    return downsample_frame(frame[columns], columns[0], n_out=n_points)
@@ -0,0 +1,135 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from emona.baseline import hour_of_week
+from emona.timeindex import HOURS_PER_WEEK, calendar_keys, time_bounds
+
+##--- ``hours``/``days``: hours of the day and weekdays (Monday 0) the band
+##--- covers, None for all of them
+Band = namedtuple("Band", ["name", "rate", "hours", "days"], defaults=[None, None])
+
+
+class Tariff:
+    """Time-of-use energy rates in Rp/kWh, plus a monthly demand charge.
+
+    Each hour of the week is priced by the first band covering it. The 168
+    hour-of-week slots are resolved to a band once, so pricing any series is
+    one gather and one multiply. ``demand_rate`` is charged in Rp per kW of
+    the month's peak demand.
+    """
+
+    def __init__(self, name, bands, demand_rate=0.0):
+        self.name = name
+        self.bands = list(bands)
+        self.demand_rate = demand_rate
+        self.band_names = [band.name for band in self.bands]
+        self.band_rates = np.array([band.rate for band in self.bands], dtype="float64")
+
+        day, hour = np.divmod(np.arange(HOURS_PER_WEEK), 24)
+        self.slot_band = np.full(HOURS_PER_WEEK, -1)
+        for code in reversed(range(len(self.bands))):
+            band = self.bands[code]
+            covered = np.ones(HOURS_PER_WEEK, dtype=bool)
+            if band.hours is not None:
+                covered &= np.isin(hour, list(band.hours))
+            if band.days is not None:
+                covered &= np.isin(day, list(band.days))
+            self.slot_band[covered] = code
+        if (self.slot_band < 0).any():
+            raise ValueError(f"{name}: some hours of the week have no band")
+        self.slot_rates = self.band_rates[self.slot_band]
+
+    def band_codes(self, timestamps):
+        """Position in ``bands`` of the band pricing each timestamp."""
+        return self.slot_band[hour_of_week(timestamps)]
+
+    def rates(self, timestamps):
+        """Rp/kWh of each timestamp."""
+        return self.slot_rates[hour_of_week(timestamps)]
+
+    def energy_cost(self, timestamps, energy):
+        """Cost of ``energy`` kWh per row, for one column or a block of them."""
+        energy = np.asarray(energy, dtype="float64")
+        rates = self.rates(timestamps)
+        return energy * (rates if energy.ndim == 1 else rates[:, None])
+
+
+##--- PLN I-3/TM: LWBP base rate, WBP (17:00-22:00) at K = 1.4 times it
+PLN_LWBP = 1114.74
+TARIFFS = {
+    tariff.name: tariff
+    for tariff in [
+        Tariff(
+            "PLN I-3/TM (WBP/LWBP)",
+            [Band("WBP", 1.4 * PLN_LWBP, range(17, 22)), Band("LWBP", PLN_LWBP)],
+            demand_rate=29500.0,
+        ),
+        Tariff("Flat", [Band("Flat", 1444.70)]),
+    ]
+}
+DEFAULT_TARIFF = "PLN I-3/TM (WBP/LWBP)"
+
+
+class TariffIndex:
+    """Running energy totals per tariff band, for range costs in two lookups.
+
+    Row ``k`` of the cumulative table holds each band's energy over rows
+    ``0..k-1``, so the energy cost of positions ``[i, j)`` is
+    ``(cum[j] - cum[i]) @ rates``; ``i`` and ``j`` may be arrays to price
+    many ranges at once. Demand is the mean power of each row, and a
+    range pays its share of each month's peak demand charge.
+    """
+
+    def __init__(self, tariff, timestamps, energy):
+        self.tariff = tariff
+        self.index = pd.DatetimeIndex(timestamps)
+        energy = np.asarray(energy, dtype="float64")
+        self.single = energy.ndim == 1
+        energy = np.nan_to_num(energy.reshape(len(energy), -1))
+        self.step = pd.Series(self.index[:1000]).diff().median()
+
+        codes = tariff.band_codes(self.index)
+        self._energy = np.zeros((len(energy) + 1, len(tariff.bands), energy.shape[1]))
+        for code in range(len(tariff.bands)):
+            self._energy[1:, code] = np.cumsum(
+                np.where((codes == code)[:, None], energy, 0.0), axis=0
+            )
+
+        keys = calendar_keys(self.index)
+        self._month = keys["year"].to_numpy("int64") * 12 + keys["month"].to_numpy()
+        self._demand = energy / (self.step / pd.Timedelta(hours=1))
+
+    def _shape(self, values):
+        return values[..., 0] if self.single else values
+
+    def bounds(self, start, end):
+        return time_bounds(self.index, start, end)
+
+    def energy(self, i, j):
+        """kWh of ``[i, j)`` per band (rows) and column."""
+        return self._shape(self._energy[j] - self._energy[i])
+
+    def energy_cost(self, i, j, rates=None):
+        """Energy cost of ``[i, j)``, at the tariff's band rates by default."""
+        rates = self.tariff.band_rates if rates is None else np.asarray(rates)
+        energy = self._energy[j] - self._energy[i]
+        return self._shape(np.einsum("...bc,b->...c", energy, rates))
+
+    def demand_cost(self, i, j):
+        """Share of each touched month's demand charge, by time covered."""
+        if j <= i or not self.tariff.demand_rate:
+            return self._shape(np.zeros(self._demand.shape[1]))
+        months = self._month[i:j]
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        peaks = np.maximum.reduceat(self._demand[i:j], starts, axis=0)
+        first = (months[starts] - 1 - 1970 * 12).astype("datetime64[M]")
+        days = ((first + 1).astype("datetime64[D]") - first).astype("float64")
+        covered = np.diff(np.r_[starts, j - i]) * (self.step / pd.Timedelta(days=1))
+        share = np.minimum(covered / days, 1.0)
+        return self._shape(self.tariff.demand_rate * (share @ peaks))
+
+    def cost(self, i, j):
+        """Energy plus demand cost of ``[i, j)``."""
+        return self.energy_cost(i, j) + self.demand_cost(i, j)
@@ -0,0 +1,282 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from emona.anomaly import AnomalyDetector
+from emona.changepoint import CusumDetector
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """Fixed-size history of samples for a set of channels.
+
+    Each channel is one column of a preallocated ``(capacity, channels)``
+    array, so pushing a sample never allocates.
+    """
+
+    def __init__(self, channels, capacity=3600):
+        self.channels = list(channels)
+        self.capacity = capacity
+        self.times = np.full(capacity, np.nan)
+        self.values = np.full((capacity, len(self.channels)), np.nan, dtype="float32")
+        self.head = 0
+        self.size = 0
+
+    def push(self, timestamp, values):
+        self.times[self.head] = timestamp
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def replace_last(self, values):
+        self.values[(self.head - 1) % self.capacity] = values
+
+    def history(self, channel=None, n=None):
+        """Return ``(times, values)`` of the last ``n`` samples, oldest first."""
+        n = self.size if n is None else min(n, self.size)
+        order = (self.head - n + np.arange(n)) % self.capacity
+        values = self.values[order]
+        if channel is not None:
+            values = values[:, self.channels.index(channel)]
+        return self.times[order], values
+
+
+class MetricHistory:
+    """Rolling store of the last ``capacity`` values of a few KPIs.
+
+    ``update`` accepts overlapping batches: only periods newer than the last
+    one stored are appended, and the last period is refreshed in place while
+    it is still filling up.
+    """
+
+    def __init__(self, names, capacity=30):
+        self.buffer = RingBuffer(names, capacity)
+        self.last = None
+        self._lock = threading.Lock()
+
+    def update(self, times, values):
+        with self._lock:
+            for timestamp, row in zip(times, values):
+                timestamp = timestamp.timestamp()
+                if self.last is None or timestamp > self.last:
+                    self.buffer.push(timestamp, row)
+                    self.last = timestamp
+                elif timestamp == self.last:
+                    self.buffer.replace_last(row)
+
+    def series(self, name):
+        with self._lock:
+            return self.buffer.history(name)[1]
+
+
+class Snapshot:
+    """Latest reading of every channel, shared read-only between sessions.
+
+    ``flags`` marks the channels whose reading was an anomaly when sampled.
+    """
+
+    def __init__(self, timestamp, channels, values, flags=None):
+        self.timestamp = timestamp
+        self.channels = channels
+        self.values = values
+        self.flags = np.zeros(len(channels), dtype=bool) if flags is None else flags
+        self._positions = {channel: i for i, channel in enumerate(channels)}
+
+    def __getitem__(self, channel):
+        return self.values[self._positions[channel]]
+
+    def _take(self, array, channels):
+        return array[[self._positions[channel] for channel in channels]]
+
+    def take(self, channels):
+        return self._take(self.values, channels)
+
+    def take_flags(self, channels):
+        return self._take(self.flags, channels)
+
+
+class Collector:
+    """Background thread sampling every channel at a fixed rate.
+
+    ``sample`` is called once per tick and must return one value per
+    channel; ``close``, if given, releases it once the collector stops. Viewer sessions only read ``snapshot()`` and ``history()``, so
+    acquisition cost does not depend on how many sessions are connected.
+    Every sample is scored by an ``AnomalyDetector`` over the last
+    ``anomaly_window`` ticks as it arrives. Once ``reference_window`` ticks
+    are in, their mean and spread become each channel's reference and a
+    ``CusumDetector`` watches for lasting shifts away from it.
+    """
+
+    def __init__(
+        self,
+        channels,
+        sample,
+        interval=1.0,
+        capacity=3600,
+        anomaly_window=60,
+        reference_window=600,
+        close=None,
+    ):
+        self.channels = list(channels)
+        self.sample = sample
+        self.close = close
+        self.interval = interval
+        self.buffer = RingBuffer(self.channels, capacity)
+        self.detector = AnomalyDetector(self.channels, anomaly_window)
+        self.changes = CusumDetector(self.channels)
+        self.reference_window = min(reference_window, capacity)
+        self.reference = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = Snapshot(
+            np.nan, self.channels, np.full(len(self.channels), np.nan)
+        )
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            ##--- First sample inline so the first viewer never sees an empty snapshot
+            self._safe_tick()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="emona-collector", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Stop sampling and release the source once the last tick is done."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.close is not None:
+            self.close()
+            self.close = None
+
+    def tick(self):
+        timestamp = time.time()
+        values = np.asarray(self.sample(), dtype="float64")
+        with self._lock:
+            self.buffer.push(timestamp, values)
+            flags = self.detector.update(values)
+            self._track_changes(timestamp, values)
+        ##--- Publish a fresh object instead of mutating the one readers hold
+        self._snapshot = Snapshot(timestamp, self.channels, values, flags)
+
+    def _track_changes(self, timestamp, values):
+        if self.reference is None:
+            if self.buffer.size < self.reference_window:
+                return
+            history = self.buffer.history()[1]
+            with np.errstate(invalid="ignore"):
+                self.reference = (
+                    np.nanmean(history, axis=0)[None],
+                    np.fmax(np.nanstd(history, axis=0), 1e-9)[None],
+                )
+        self.changes.update(
+            pd.to_datetime([timestamp], unit="s"), values[None], *self.reference
+        )
+
+    def _safe_tick(self):
+        try:
+            self.tick()
+        except Exception:  # keep sampling after a bad read
+            logger.exception("Telemetry sample failed")
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.interval
+            if self._stop.wait(max(0.0, next_tick - time.monotonic())):
+                break
+            self._safe_tick()
+
+    def snapshot(self):
+        return self._snapshot
+
+    def history(self, channel=None, n=None):
+        with self._lock:
+            return self.buffer.history(channel, n)
+
+    def changepoints(self):
+        """Lasting shifts found so far, oldest first."""
+        with self._lock:
+            return list(self.changes.events)
+
+
+def random_source(n, low=100, high=4900):
+    """Stand-in sampler until the meters are wired in."""
+    return lambda: np.random.randint(low, high, n)
+
+
+def make_source(channels, source=None):
+    """``(sample, close)`` for ``channels``, picked by ``EMONA_SOURCE``.
+
+    ``random`` (default) draws stand-in values, ``modbus`` polls the gateways
+    in ``data/channels.csv`` and ``simulator`` does the same against an
+    in-process Modbus simulator. ``close`` releases the connections, event
+    loop and simulators; None when there is nothing to release.
+    """
+    source = source or os.environ.get("EMONA_SOURCE", "random")
+    if source == "random":
+        return random_source(len(channels)), None
+
+    from emona import modbus
+
+    engine = modbus.AcquisitionEngine(modbus.load_channels())
+    servers = []
+    if source == "simulator":
+        for gateway in engine.batches:
+            host, port = modbus.split_gateway(gateway)
+            servers.append(engine.submit(modbus.Simulator().start(host, port)).result())
+
+    async def close_servers():
+        for server in servers:
+            server.close()
+
+    def close():
+        engine.submit(close_servers()).result()
+        engine.close()
+
+    return engine.sampler(channels), close
+
+
+@st.cache_resource
+def _collector_store():
+    return {"lock": threading.Lock(), "collector": None}
+
+
+def get_collector(channels, interval=1.0):
+    """Process-wide collector for ``channels``, started on first use.
+
+    One collector runs per process. When the channels change (the motor
+    registry was edited) the previous collector is stopped, with its
+    source, before the new one starts.
+    """
+    channels = tuple(channels)
+    store = _collector_store()
+    with store["lock"]:
+        collector = store["collector"]
+        if (
+            collector is None
+            or tuple(collector.channels) != channels
+            or collector.interval != interval
+        ):
+            if collector is not None:
+                collector.stop()
+            sample, close = make_source(channels)
+            collector = Collector(channels, sample, interval, close=close).start()
+            store["collector"] = collector
+    return collector
+
+
+@st.cache_resource
+def get_metric_history(names, capacity=30):
+    """Process-wide rolling KPI history shared by every session."""
+    return MetricHistory(names, capacity)
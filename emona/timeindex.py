@@ -0,0 +1,77 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+ONE_DAY = pd.Timedelta(days=1)
+HOUR_NS = 3_600_000_000_000
+DAY_NS = 24 * HOUR_NS
+HOURS_PER_WEEK = 7 * 24
+
+
+def _is_date(value):
+    return isinstance(value, datetime.date) and not isinstance(value, datetime.datetime)
+
+
+def time_bounds(index, start, end):
+    """Return the ``(i, j)`` positions of ``[start, end]`` in a sorted index.
+
+    Both ends are inclusive. A plain ``date`` as ``end`` covers the whole day.
+    """
+    i = index.searchsorted(pd.Timestamp(start), side="left")
+    if _is_date(end):
+        j = index.searchsorted(pd.Timestamp(end) + ONE_DAY, side="left")
+    else:
+        j = index.searchsorted(pd.Timestamp(end), side="right")
+    return i, max(i, j)
+
+
+def slice_range(frame, start, end):
+    """Rows of ``frame`` between ``start`` and ``end`` as a positional slice.
+
+    ``frame`` must have a sorted ``DatetimeIndex``. The result is an
+    ``iloc`` slice, so no boolean mask is built.
+    """
+    i, j = time_bounds(frame.index, start, end)
+    return frame.iloc[i:j]
+
+
+def slice_day(frame, day):
+    """Rows of ``frame`` falling on the calendar ``day``."""
+    day = pd.Timestamp(day).normalize()
+    return slice_range(frame, day.date(), day.date())
+
+
+def available_days(index):
+    """Calendar days that have at least one row, oldest first."""
+    if len(index) == 0:
+        return []
+    days = pd.date_range(index[0].normalize(), index[-1].normalize(), freq="D")
+    counts = index.searchsorted(days + ONE_DAY) - index.searchsorted(days)
+    return [day.date() for day in days[np.flatnonzero(counts)]]
+
+
+def calendar_keys(timestamps):
+    """Integer calendar keys of each timestamp, for grouping and pivoting.
+
+    Returns a frame aligned with ``timestamps`` holding ``day`` (days since
+    1970-01-01), ``hour``, ``day_of_week`` (Monday=0), ``month`` (1-12) and
+    ``year``, all derived from the raw nanoseconds without ``.dt`` accessors.
+    Time zone aware stamps are keyed on their local wall time.
+    """
+    index = pd.DatetimeIndex(timestamps)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    ns = index.asi8
+    days = ns // DAY_NS
+    months = ns.astype("datetime64[ns]").astype("datetime64[M]").view("int64")
+    return pd.DataFrame(
+        {
+            "day": days.astype("int32"),
+            "hour": (ns // HOUR_NS % 24).astype("int8"),
+            "day_of_week": ((days + 3) % 7).astype("int8"),
+            "month": (months % 12 + 1).astype("int8"),
+            "year": (months // 12 + 1970).astype("int16"),
+        },
+        index=timestamps.index if isinstance(timestamps, pd.Series) else None,
+    )
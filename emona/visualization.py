@@ -0,0 +1,60 @@
+import plotly.graph_objects as go
+import streamlit as st
+
+
+def _metric_figure(label, prefix, suffix, show_graph, color_graph):
+    fig = go.Figure()
+    fig.add_trace(
+        go.Indicator(
+            value=0,
+            gauge={"axis": {"visible": False}},
+            number={"prefix": prefix, "suffix": suffix, "font.size": 28},
+            title={
+                "text": label,
+                "font": {"size": 24},
+            },
+        )
+    )
+
+    if show_graph:
+        fig.add_trace(
+            go.Scatter(
+                y=[],
+                hoverinfo="skip",
+                fill="tozeroy",
+                fillcolor=color_graph,
+                line={"color": color_graph},
+            )
+        )
+
+    fig.update_xaxes(visible=False, fixedrange=True)
+    fig.update_yaxes(visible=False, fixedrange=True)
+
+    fig.update_layout(
+        margin=dict(t=30, b=0),
+        showlegend=False,
+        plot_bgcolor="white",
+        height=100,
+    )
+    return fig
+
+
+def plot_metric(
+    label, value, prefix="", suffix="", show_graph=False, color_graph="", history=()
+):
+    """KPI tile with an optional sparkline of ``history``.
+
+    The figure is built once per session and reused; later reruns only swap
+    the indicator value and the sparkline data.
+    """
+    figures = st.session_state.setdefault("_metric_figures", {})
+    template = (label, prefix, suffix, show_graph, color_graph)
+    fig = figures.get(template)
+    if fig is None:
+        fig = figures[template] = _metric_figure(*template)
+
+    fig.data[0].value = value
+    if show_graph:
+        fig.data[1].y = history
+
+    st.plotly_chart(fig, use_container_width=True)
@@ -1,17 +1,113 @@
-# import time
-# import psutil
-# import streamlit as st
+import os
 
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
 
-# # Function to get the memory usage.
-# def memory_usage():
-#     return psutil.virtual_memory().percent
+from emona.baseline import hour_of_week
+from emona.data import (
+    DATA_PATH,
+    ZONE_COLUMNS,
+    load_forecaster,
+    load_power_consumption,
+)
+from emona.forecast import future_index, weather_profile
+from emona.tariff import DEFAULT_TARIFF, TARIFFS
 
+HORIZONS = {"1 hari": 1, "7 hari": 7, "30 hari": 30}
+##--- Weeks of weather averaged into the profile standing in for a forecast
+WEATHER_WEEKS = 4
 
-# # Assigning Streamlit metric to a variable.
-# memory_data = st.metric(label="Live Memory Data", value=memory_usage())
 
-# # Updating the data
-# while True:
-#     time.sleep(1)
-#     memory_data.metric(label="Live Memory Data", value=memory_usage())
+##--- Forecast of every zone, computed once per version of the CSV, fitted
+##--- model and horizon. A rewritten CSV changes the weather profile, and
+##--- load_forecaster refits the model if any earlier reading changed, even
+##--- when the row count stays the same
+@st.cache_data(max_entries=8, show_spinner=False)
+def zone_forecast(mtime_ns, rows, days):
+    data = load_power_consumption()
+    model = load_forecaster()
+    timestamps = future_index(data.index, pd.Timedelta(days=days))
+    profile = weather_profile(data.index, data[model.regressors], WEATHER_WEEKS)
+    weather = profile[hour_of_week(timestamps)]
+    return pd.DataFrame(
+        model.predict(timestamps, weather).clip(0),
+        index=timestamps,
+        columns=model.targets,
+    )
+
+
+st.header("Prediksi Konsumsi")
+
+data = load_power_consumption()
+model = load_forecaster()
+
+col1, col2 = st.columns(2)
+
+with col1:
+    horizon = st.selectbox("Periode prediksi", list(HORIZONS), index=1)
+
+with col2:
+    selected_zone = st.selectbox("Pilih Zona", ["Zona 1", "Zona 2", "Zona 3"])
+
+zone_column = ZONE_COLUMNS[int(selected_zone[-1]) - 1]
+forecast = zone_forecast(os.stat(DATA_PATH).st_mtime_ns, model.rows, HORIZONS[horizon])
+
+##--- Readings are in W: energy of each interval in kWh
+step = pd.Series(data.index[:1000]).diff().median()
+hours = step / pd.Timedelta(hours=1)
+forecast_kwh = forecast.to_numpy() * hours / 1000
+forecast_cost = TARIFFS[DEFAULT_TARIFF].energy_cost(forecast.index, forecast_kwh)
+
+##--- Accuracy of the model over the last week of readings it was fitted on
+last_week = data.loc[data.index[-1] - pd.Timedelta(days=7) :]
+fitted = model.predict(last_week.index, last_week[model.regressors])
+error = np.abs(fitted - last_week[ZONE_COLUMNS].to_numpy())
+mae = np.nanmean(error, axis=0)
+mape = np.nanmean(error / last_week[ZONE_COLUMNS].to_numpy(), axis=0)
+
+st.subheader(f"Prediksi {horizon} ke depan")
+
+metric_columns = st.columns(len(ZONE_COLUMNS), border=True)
+for i, (column, zone) in enumerate(zip(metric_columns, ZONE_COLUMNS)):
+    with column:
+        st.metric(
+            label=f"Zona {i + 1}",
+            value=f"{forecast_kwh[:, i].sum():,.1f} kWh",
+            help=f"MAE minggu terakhir {mae[i]:,.0f} W ({mape[i]:.1%})",
+        )
+        st.caption(f"Perkiraan biaya Rp {forecast_cost[:, i].sum():,.0f}")
+
+##--- Last week of readings followed by the forecast
+fig = go.Figure()
+fig.add_trace(
+    go.Scatter(
+        x=last_week.index,
+        y=last_week[zone_column],
+        mode="lines",
+        name="Aktual",
+    )
+)
+fig.add_trace(
+    go.Scatter(
+        x=forecast.index,
+        y=forecast[zone_column],
+        mode="lines",
+        name="Prediksi",
+        line=dict(dash="dash"),
+    )
+)
+fig.update_layout(
+    title=f"Konsumsi listrik {selected_zone}",
+    xaxis_title="Waktu",
+    yaxis_title="Daya (W)",
+    height=400,
+)
+st.plotly_chart(fig, use_container_width=True)
+
+st.caption(
+    f"Model per jam dalam seminggu dengan regresor {', '.join(model.regressors)}. "
+    f"Cuaca ke depan memakai rata-rata {WEATHER_WEEKS} minggu terakhir; "
+    f"biaya dengan tarif {DEFAULT_TARIFF}."
+)
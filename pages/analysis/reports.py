@@ -28,6 +28,16 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import calendar
 
+from emona.aggregate import aggregate
+from emona.baseline import SeasonalBaseline
+from emona.changepoint import CusumDetector
+from emona.downsample import downsample_frame
+from emona.export import FORMATS, download_export
+from emona.forecast import SeasonalRegression, future_index
+from emona.prefix import PrefixIndex, WeekHourIndex
+from emona.tariff import DEFAULT_TARIFF, TARIFFS, TariffIndex
+from emona.timeindex import time_bounds
+
 # # Configure page layout
 # st.set_page_config(
 #     page_title="Power Utility Monitoring Dashboard",
@@ -79,86 +89,223 @@ st.markdown(
 st.markdown("Monitor electricity consumption, costs, and analysis in real-time")
 
 
-# Generate sample data for demonstration
-@st.cache_data
+##--- One column block per schema: meter readings, then appliance sub-meters
+READING_COLUMNS = [
+    "consumption_kwh",
+    "voltage",
+    "current",
+    "power_factor",
+    "price_per_kwh",
+    "cost",
+]
+APPLIANCES = ["HVAC", "Lighting", "Kitchen", "Electronics", "Water Heating", "Other"]
+BOUND_COLUMNS = ["lower_bound", "upper_bound"]
+CHANGEPOINT_COLUMNS = ["Meter", "Shift Start", "Detected", "Shift (kWh)", "Shift (%)"]
+
+
+# Generate sample data for demonstration. The frame is shared by every
+# session, so pages must slice it and never write into it.
+@st.cache_resource
 def generate_sample_data():
     # Generate dates for the last 12 months
     end_date = datetime.now()
     start_date = end_date - timedelta(days=365)
     date_range = pd.date_range(start=start_date, end=end_date, freq="h")
+    n = len(date_range)
+    daily = np.sin(np.pi * date_range.hour.to_numpy() / 12)
+    seasonal = np.sin(np.pi * date_range.dayofyear.to_numpy() / 182.5)
 
-    # Create dataframe with hourly data
-    df = pd.DataFrame(
-        {
-            "timestamp": date_range,
-            "consumption_kwh": np.random.normal(
-                loc=2.1, scale=1.2, size=len(date_range)
-            )
-            * (1 + 0.3 * np.sin(np.pi * date_range.hour / 12))  # Daily pattern
-            * (
-                1 + 0.2 * np.sin(np.pi * date_range.dayofyear / 182.5)
-            ),  # Seasonal pattern
-            "voltage": np.random.normal(loc=230, scale=3, size=len(date_range)),
-            "current": np.random.normal(loc=10, scale=3, size=len(date_range)),
-            "power_factor": np.random.normal(
-                loc=0.92, scale=0.03, size=len(date_range)
-            ).clip(0.8, 1.0),
-        }
-    )
+    # Hourly readings with a daily and a seasonal pattern
+    consumption = (
+        np.random.normal(loc=2.1, scale=1.2, size=n)
+        * (1 + 0.3 * daily)
+        * (1 + 0.2 * seasonal)
+    ).clip(0.1, None)
 
-    # Ensure consumption is positive
-    df["consumption_kwh"] = df["consumption_kwh"].clip(0.1, None)
+    # Price per kWh under the site's time-of-use tariff
+    price = TARIFFS[DEFAULT_TARIFF].rates(date_range)
+
+    # Add some random peaks for anomaly detection
+    random_peaks = np.random.choice(n, size=int(n * 0.001), replace=False)
+    consumption[random_peaks] *= np.random.uniform(1.5, 3.0, size=len(random_peaks))
+
+    readings = {
+        "consumption_kwh": consumption,
+        "voltage": np.random.normal(loc=230, scale=3, size=n),
+        "current": np.random.normal(loc=10, scale=3, size=n),
+        "power_factor": np.random.normal(loc=0.92, scale=0.03, size=n).clip(0.8, 1.0),
+        "price_per_kwh": price,
+        "cost": consumption * price,
+    }
 
-    # Add price per kWh with seasonal variations
-    df["price_per_kwh"] = 0.15 + 0.05 * np.sin(
-        np.pi * df["timestamp"].dt.dayofyear / 182.5
+    # Appliance shares of each hour's consumption (simulated), summing to one
+    weights = np.random.uniform(0.1, 0.3, size=len(APPLIANCES)) * np.random.uniform(
+        0.8, 1.2, size=(n, len(APPLIANCES))
     )
+    shares = weights / weights.sum(axis=1, keepdims=True)
+    appliance_values = shares * consumption[:, None]
 
-    # Calculate costs
-    df["cost"] = df["consumption_kwh"] * df["price_per_kwh"]
+    # Score every meter against its own hour-of-week baseline in one pass
+    meters = pd.DataFrame(
+        np.column_stack([consumption, appliance_values]),
+        columns=["consumption_kwh"] + APPLIANCES,
+    )
+    baseline = SeasonalBaseline(date_range, meters)
+    lower, upper = baseline.bounds(date_range)
 
-    # Add some random peaks for anomaly detection
-    random_peaks = np.random.choice(df.index, size=int(len(df) * 0.001), replace=False)
-    df.loc[random_peaks, "consumption_kwh"] *= np.random.uniform(
-        1.5, 3.0, size=len(random_peaks)
-    )
-    df.loc[random_peaks, "cost"] = (
-        df.loc[random_peaks, "consumption_kwh"] * df.loc[random_peaks, "price_per_kwh"]
-    )
-
-    # Add appliance-specific data (simulated)
-    appliances = [
-        "HVAC",
-        "Lighting",
-        "Kitchen",
-        "Electronics",
-        "Water Heating",
-        "Other",
-    ]
-
-    # For each appliance, create a distribution of consumption
-    appliance_data = {}
-    for app in appliances:
-        base_consumption = np.random.uniform(0.1, 0.3)
-        appliance_data[app] = (
-            df["consumption_kwh"]
-            * base_consumption
-            * np.random.uniform(0.8, 1.2, size=len(df))
-        )
+    columns = READING_COLUMNS + APPLIANCES + BOUND_COLUMNS
+    values = np.empty((n, len(columns)), dtype="float32")
+    values[:, : len(READING_COLUMNS)] = np.column_stack(
+        [readings[column] for column in READING_COLUMNS]
+    )
+    values[:, len(READING_COLUMNS) : -2] = appliance_values
+    values[:, -2] = lower[:, 0].clip(0)
+    values[:, -1] = upper[:, 0]
+
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, "timestamp", date_range)
+    df["anomaly"] = baseline.flags(date_range, meters)[:, 0]
+    return df
+
+
+# Running totals for range KPIs, built once per process
+@st.cache_resource
+def build_prefix_index():
+    df = generate_sample_data()
+    return PrefixIndex(df["timestamp"], df[["consumption_kwh"]])
+
+
+# Running consumption per band of a tariff, so any range is priced in two
+# lookups and switching tariff only builds one more index
+@st.cache_resource(max_entries=len(TARIFFS))
+def build_tariff_index(tariff_name):
+    df = generate_sample_data()
+    return TariffIndex(TARIFFS[tariff_name], df["timestamp"], df["consumption_kwh"])
+
+
+# Day-of-week by hour cells of consumption, pre-summed per day
+@st.cache_resource
+def build_heatmap_index():
+    df = generate_sample_data()
+    return WeekHourIndex(df["timestamp"], df["consumption_kwh"])
+
+
+# Hour-of-week model of consumption for the cost projections, fitted once
+@st.cache_resource
+def build_forecaster():
+    df = generate_sample_data()
+    return SeasonalRegression(["consumption_kwh"]).update(df["timestamp"], df)
+
+
+# Lasting shifts of every meter against its hour-of-week baseline
+@st.cache_resource
+def detect_baseline_shifts():
+    df = generate_sample_data()
+    meters = ["consumption_kwh"] + APPLIANCES
+    baseline = SeasonalBaseline(df["timestamp"], df[meters])
+    expected, scale = baseline.expected(df["timestamp"])
+    detector = CusumDetector(meters)
+    detector.update(df["timestamp"], df[meters], expected, scale)
+    shifts = pd.DataFrame(detector.events, columns=CHANGEPOINT_COLUMNS)
+    return shifts.sort_values("Detected", kind="stable", ignore_index=True)
+
+
+##--- Report stages. Each is memoized on its own inputs only, so a rerun
+##--- caused by an unrelated widget reuses them, and changing one input
+##--- recomputes just the stages that depend on it. Calendar keys are
+##--- derived once with the data in generate_sample_data.
+STAGE_ENTRIES = 16
+
+
+# Filter: positions of the rows between two dates
+@st.cache_data(max_entries=STAGE_ENTRIES, show_spinner=False)
+def select_rows(start_date, end_date):
+    return build_prefix_index().bounds(start_date, end_date)
+
+
+# Aggregate every measure at every level in one pass over the selected rows,
+# with cost and price per kWh under the chosen tariff
+@st.cache_data(max_entries=STAGE_ENTRIES, show_spinner=False)
+def aggregate_range(start_pos, end_pos, tariff_name):
+    rows = generate_sample_data().iloc[start_pos:end_pos]
+    rates = TARIFFS[tariff_name].rates(rows["timestamp"])
+    priced = pd.DataFrame(
+        {"cost": rows["consumption_kwh"].to_numpy() * rates, "price_per_kwh": rates}
+    )
+    return aggregate(
+        rows["timestamp"], [rows[["consumption_kwh"] + APPLIANCES], priced]
+    )
 
-    # Combine appliance data into one dataframe
-    appliance_df = pd.DataFrame(appliance_data)
 
-    # Normalize to make sure the sum equals the total consumption
-    row_sums = appliance_df.sum(axis=1)
-    for app in appliances:
-        appliance_df[app] = appliance_df[app] / row_sums * df["consumption_kwh"]
+# Consumption and cost at the chosen level, downsampled for plotting
+@st.cache_data(max_entries=STAGE_ENTRIES, show_spinner=False)
+def level_series(start_pos, end_pos, aggregation, tariff_name):
+    level = aggregate_range(start_pos, end_pos, tariff_name).mean(aggregation)
+    level = level.rename_axis("timestamp")
+    return (
+        downsample_frame(level[["consumption_kwh"]], "consumption_kwh"),
+        downsample_frame(level[["cost"]], "cost"),
+    )
 
-    return df, appliance_df
+
+# Range KPIs from the running totals: a few lookups per range. Cost includes
+# the range's share of the demand charge; the price is the energy rate paid.
+@st.cache_data(max_entries=STAGE_ENTRIES, show_spinner=False)
+def range_kpis(start_pos, end_pos, tariff_name):
+    consumption = build_prefix_index().sums(start_pos, end_pos)["consumption_kwh"]
+    tariff_index = build_tariff_index(tariff_name)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        price = tariff_index.energy_cost(start_pos, end_pos) / consumption
+    return consumption, tariff_index.cost(start_pos, end_pos), price
+
+
+# Projected cost of each period under a tariff, from the forecast of the
+# year after the data: energy per band plus each month's demand charge,
+# pro-rated like the range KPIs
+@st.cache_data(max_entries=len(TARIFFS), show_spinner=False)
+def projected_costs(tariff_name, days):
+    timestamps = future_index(
+        generate_sample_data()["timestamp"], pd.Timedelta(days=max(days))
+    )
+    consumption = build_forecaster().predict(timestamps)[:, 0].clip(0)
+    projection = TariffIndex(TARIFFS[tariff_name], timestamps, consumption)
+    ends = np.searchsorted(timestamps, timestamps[0] + pd.to_timedelta(days, "D"))
+    return np.array([projection.cost(0, end) for end in ends])
+
+
+# Anomaly: the range's trace and bounds, downsampled keeping every anomaly
+@st.cache_data(max_entries=STAGE_ENTRIES, show_spinner=False)
+def anomaly_points(start_pos, end_pos):
+    rows = generate_sample_data().iloc[start_pos:end_pos]
+    anomaly_df = rows[["timestamp", "consumption_kwh"] + BOUND_COLUMNS]
+    is_anomaly = rows["anomaly"]
+    plot_df = downsample_frame(
+        anomaly_df,
+        "consumption_kwh",
+        x="timestamp",
+        keep=is_anomaly.to_numpy(),
+    )
+    return plot_df, anomaly_df[is_anomaly]
+
+
+# Appliance breakdown: totals, daily totals and hourly means of the range
+@st.cache_data(max_entries=STAGE_ENTRIES, show_spinner=False)
+def appliance_breakdown(start_pos, end_pos, tariff_name):
+    aggs = aggregate_range(start_pos, end_pos, tariff_name)
+    daily = aggs.sum("Daily")[APPLIANCES].rename_axis("date")
+    totals = daily.sum().reset_index()
+    totals.columns = ["Appliance", "Consumption (kWh)"]
+    hourly = (
+        aggs.mean("hour")[APPLIANCES]
+        .rename_axis("hour")
+        .reset_index()
+        .melt(id_vars="hour", var_name="Appliance", value_name="appliance_value")
+    )
+    return totals, daily.reset_index(), hourly
 
 
 # Load data
-df, appliance_df = generate_sample_data()
+df = generate_sample_data()
 
 # Create sidebar
 st.sidebar.header("Dashboard Controls")
@@ -183,9 +330,6 @@ if date_range_option == "Custom":
     end_date = st.sidebar.date_input("End Date", max_date)
     if start_date > end_date:
         st.sidebar.error("Start date must be before end date")
-    mask = (df["timestamp"].dt.date >= start_date) & (
-        df["timestamp"].dt.date <= end_date
-    )
 else:
     end_date = df["timestamp"].max()
     if date_range_option == "Last 24 Hours":
@@ -198,25 +342,10 @@ else:
         start_date = end_date - timedelta(days=90)
     else:  # Last 365 Days
         start_date = end_date - timedelta(days=365)
-    mask = (df["timestamp"] >= start_date) & (df["timestamp"] <= end_date)
 
 # Filter data based on date range
-filtered_df = df.loc[mask].copy()
-filtered_appliance_df = appliance_df.loc[mask].copy()
-
-# Ensure all appliance columns exist after filtering
-appliances = ["HVAC", "Lighting", "Kitchen", "Electronics", "Water Heating", "Other"]
-for app in appliances:
-    if app not in filtered_appliance_df.columns:
-        filtered_appliance_df[app] = 0.0
-filtered_appliance_df = filtered_appliance_df[appliances]
-
-# Add date information for aggregations
-filtered_df["date"] = filtered_df["timestamp"].dt.date
-filtered_df["hour"] = filtered_df["timestamp"].dt.hour
-filtered_df["day_of_week"] = filtered_df["timestamp"].dt.dayofweek
-filtered_df["month"] = filtered_df["timestamp"].dt.month
-filtered_df["year"] = filtered_df["timestamp"].dt.year
+start_pos, end_pos = select_rows(start_date, end_date)
+filtered_df = df.iloc[start_pos:end_pos]
 
 # Sidebar for aggregation level
 aggregation = st.sidebar.selectbox(
@@ -226,64 +355,34 @@ aggregation = st.sidebar.selectbox(
 # Sidebar for comparing periods
 compare_periods = st.sidebar.checkbox("Compare with Previous Period")
 
-# Comparison logic
-if compare_periods:
-    delta_days = (filtered_df["timestamp"].max() - filtered_df["timestamp"].min()).days
-    previous_end = filtered_df["timestamp"].min() - timedelta(hours=1)
-    previous_start = previous_end - timedelta(days=delta_days)
-    previous_mask = (df["timestamp"] >= previous_start) & (
-        df["timestamp"] <= previous_end
-    )
-    previous_df = df.loc[previous_mask].copy()
-
-    # Add date information for previous period
-    previous_df["date"] = previous_df["timestamp"].dt.date
-    previous_df["hour"] = previous_df["timestamp"].dt.hour
-    previous_df["day_of_week"] = previous_df["timestamp"].dt.dayofweek
-    previous_df["month"] = previous_df["timestamp"].dt.month
-    previous_df["year"] = previous_df["timestamp"].dt.year
-else:
-    previous_df = None
+# Sidebar for the tariff costs are computed under
+tariff_name = st.sidebar.selectbox("Tariff", list(TARIFFS))
 
-# Create tabs for different dashboard sections
-tab1, tab2, tab3, tab4 = st.tabs(
-    ["Overview", "Consumption Analysis", "Cost Analysis", "Appliance Breakdown"]
+# Dashboard sections. Unlike st.tabs, only the selected section is computed
+# and drawn on each rerun.
+TABS = ["Overview", "Consumption Analysis", "Cost Analysis", "Appliance Breakdown"]
+active_tab = st.radio(
+    "Section", TABS, horizontal=True, key="reports_tab", label_visibility="collapsed"
 )
 
 
-# Aggregate data based on selected aggregation level
-def aggregate_data(df, agg_level):
-    if agg_level == "Hourly":
-        return df.set_index("timestamp").resample("h").mean(numeric_only=True)
-    elif agg_level == "Daily":
-        return df.set_index("timestamp").resample("D").mean(numeric_only=True)
-    elif agg_level == "Weekly":
-        return df.set_index("timestamp").resample("W").mean(numeric_only=True)
-    else:  # Monthly
-        return df.set_index("timestamp").resample("M").mean(numeric_only=True)
-
-
-agg_df = aggregate_data(filtered_df, aggregation)
-agg_cost = aggregate_data(filtered_df[["timestamp", "cost"]], aggregation)
-agg_consumption = aggregate_data(
-    filtered_df[["timestamp", "consumption_kwh"]], aggregation
-)
-agg_appliance = aggregate_data(
-    pd.concat([filtered_df[["timestamp"]], filtered_appliance_df], axis=1), aggregation
-)
+aggs = aggregate_range(start_pos, end_pos, tariff_name)
+daily_totals = aggs.sum("Daily").rename_axis("date")
+hourly_means = aggs.mean("hour").rename_axis("hour")
 
 # Calculate KPIs
-total_consumption = filtered_df["consumption_kwh"].sum()
-total_cost = filtered_df["cost"].sum()
-avg_price = filtered_df["price_per_kwh"].mean()
-peak_consumption = filtered_df.groupby("date")["consumption_kwh"].sum().max()
-peak_date = filtered_df.groupby("date")["consumption_kwh"].sum().idxmax()
+total_consumption, total_cost, avg_price = range_kpis(start_pos, end_pos, tariff_name)
+peak_consumption = daily_totals["consumption_kwh"].max()
+peak_date = daily_totals["consumption_kwh"].idxmax().date()
 
-# Calculate comparisons if requested
+# Calculate comparisons against the preceding window of equal length
 if compare_periods:
-    prev_total_consumption = previous_df["consumption_kwh"].sum()
-    prev_total_cost = previous_df["cost"].sum()
-    prev_avg_price = previous_df["price_per_kwh"].mean()
+    previous_start_pos, previous_end_pos = build_prefix_index().previous(
+        start_pos, end_pos
+    )
+    prev_total_consumption, prev_total_cost, prev_avg_price = range_kpis(
+        previous_start_pos, previous_end_pos, tariff_name
+    )
 
     consumption_change = (
         (total_consumption - prev_total_consumption) / prev_total_consumption * 100
@@ -292,7 +391,7 @@ if compare_periods:
     price_change = (avg_price - prev_avg_price) / prev_avg_price * 100
 
 # TAB 1: OVERVIEW
-with tab1:
+if active_tab == "Overview":
     st.markdown('<div class="sub-header">Key Metrics</div>', unsafe_allow_html=True)
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -311,7 +410,7 @@ with tab1:
         with st.container():
             st.metric(
                 "Total Cost",
-                f"${total_cost:.2f}",
+                f"Rp {total_cost:,.0f}",
                 f"{cost_change:.1f}%" if compare_periods else None,
                 delta_color=(
                     "inverse" if compare_periods and cost_change > 0 else "normal"
@@ -321,7 +420,7 @@ with tab1:
         with st.container():
             st.metric(
                 "Average Price",
-                f"${avg_price:.4f}/kWh",
+                f"Rp {avg_price:,.2f}/kWh",
                 f"{price_change:.1f}%" if compare_periods else None,
                 delta_color=(
                     "inverse" if compare_periods and price_change > 0 else "normal"
@@ -335,6 +434,10 @@ with tab1:
                 f"on {peak_date}",
             )
 
+    agg_consumption, agg_cost = level_series(
+        start_pos, end_pos, aggregation, tariff_name
+    )
+
     st.markdown(
         '<div class="sub-header">Consumption Over Time</div>', unsafe_allow_html=True
     )
@@ -357,20 +460,20 @@ with tab1:
             x="timestamp",
             y="cost",
             title=f"{aggregation} Cost",
-            labels={"timestamp": "Time", "cost": "Cost ($)"},
+            labels={"timestamp": "Time", "cost": "Cost (Rp)"},
             line_shape="spline",
         )
         fig.update_layout(height=400)
         st.plotly_chart(fig, use_container_width=True)
 
 # TAB 2: CONSUMPTION ANALYSIS
-with tab2:
+if active_tab == "Consumption Analysis":
     st.markdown(
         '<div class="sub-header">Consumption Patterns</div>', unsafe_allow_html=True
     )
 
     # Hourly consumption pattern
-    hourly_avg = filtered_df.groupby("hour")["consumption_kwh"].mean().reset_index()
+    hourly_avg = hourly_means[["consumption_kwh"]].reset_index()
 
     col1, col2 = st.columns(2)
 
@@ -389,7 +492,9 @@ with tab2:
 
     # Daily consumption pattern
     daily_avg = (
-        filtered_df.groupby("day_of_week")["consumption_kwh"].mean().reset_index()
+        aggs.mean("day_of_week")[["consumption_kwh"]]
+        .rename_axis("day_of_week")
+        .reset_index()
     )
     daily_avg["day_name"] = daily_avg["day_of_week"].apply(
         lambda x: calendar.day_name[x]
@@ -417,7 +522,7 @@ with tab2:
         filtered_df["timestamp"].max() - filtered_df["timestamp"].min()
     ).days >= 60:  # Only show if enough data
         monthly_avg = (
-            filtered_df.groupby("month")["consumption_kwh"].mean().reset_index()
+            aggs.mean("month")[["consumption_kwh"]].rename_axis("month").reset_index()
         )
         monthly_avg["month_name"] = monthly_avg["month"].apply(
             lambda x: calendar.month_name[x]
@@ -444,9 +549,11 @@ with tab2:
     )
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
 
-    # Create day-hour heatmap
-    pivot_df = filtered_df.pivot_table(
-        index="day_of_week", columns="hour", values="consumption_kwh", aggfunc="mean"
+    # Create day-hour heatmap from the pre-summed cells of the selected range
+    pivot_df = (
+        pd.DataFrame(build_heatmap_index().means(start_pos, end_pos))
+        .dropna(how="all")
+        .dropna(axis=1, how="all")
     )
     # Dynamically generate y and x labels based on pivot_df shape
     y_labels = [calendar.day_name[i] for i in pivot_df.index]  # Only those present
@@ -468,19 +575,9 @@ with tab2:
         '<div class="sub-header">Anomaly Detection</div>', unsafe_allow_html=True
     )
 
-    # Define anomalies as points more than 3 standard deviations from the mean
-    rolling_mean = filtered_df["consumption_kwh"].rolling(window=24).mean()
-    rolling_std = filtered_df["consumption_kwh"].rolling(window=24).std()
-
-    filtered_df["upper_bound"] = rolling_mean + 3 * rolling_std
-    filtered_df["lower_bound"] = (rolling_mean - 3 * rolling_std).clip(0)
-
-    # Identify anomalies
-    filtered_df["anomaly"] = (
-        filtered_df["consumption_kwh"] > filtered_df["upper_bound"]
-    ) | (filtered_df["consumption_kwh"] < filtered_df["lower_bound"])
-
-    anomalies = filtered_df[filtered_df["anomaly"]]
+    # Anomalies are points outside the usual range for their hour of the
+    # week (median +/- 3.5 robust deviations), flagged when data is generated
+    plot_df, anomalies = anomaly_points(start_pos, end_pos)
 
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     fig = go.Figure()
@@ -488,8 +585,8 @@ with tab2:
     # Add consumption line
     fig.add_trace(
         go.Scatter(
-            x=filtered_df["timestamp"],
-            y=filtered_df["consumption_kwh"],
+            x=plot_df["timestamp"],
+            y=plot_df["consumption_kwh"],
             name="Consumption",
             line=dict(color="blue", width=1),
         )
@@ -498,8 +595,8 @@ with tab2:
     # Add upper bound
     fig.add_trace(
         go.Scatter(
-            x=filtered_df["timestamp"],
-            y=filtered_df["upper_bound"],
+            x=plot_df["timestamp"],
+            y=plot_df["upper_bound"],
             name="Upper Bound",
             line=dict(color="red", width=1, dash="dash"),
             opacity=0.5,
@@ -509,8 +606,8 @@ with tab2:
     # Add lower bound
     fig.add_trace(
         go.Scatter(
-            x=filtered_df["timestamp"],
-            y=filtered_df["lower_bound"],
+            x=plot_df["timestamp"],
+            y=plot_df["lower_bound"],
             name="Lower Bound",
             line=dict(color="red", width=1, dash="dash"),
             opacity=0.5,
@@ -557,14 +654,31 @@ with tab2:
     else:
         st.info("No anomalies detected in the selected time period.")
 
+    # Lasting baseline shifts, which single-point anomalies do not catch
+    st.markdown('<div class="sub-header">Baseline Shifts</div>', unsafe_allow_html=True)
+    shifts = detect_baseline_shifts()
+    first_shift, last_shift = time_bounds(
+        pd.DatetimeIndex(shifts["Detected"]), start_date, end_date
+    )
+    shifts = shifts.iloc[first_shift:last_shift]
+    if not shifts.empty:
+        st.dataframe(
+            shifts,
+            hide_index=True,
+            column_config={
+                "Shift (kWh)": st.column_config.NumberColumn(format="%+.3f"),
+                "Shift (%)": st.column_config.NumberColumn(format="percent"),
+            },
+        )
+    else:
+        st.info("No lasting baseline shifts in the selected time period.")
+
 # TAB 3: COST ANALYSIS
-with tab3:
+if active_tab == "Cost Analysis":
     st.markdown('<div class="sub-header">Cost Breakdown</div>', unsafe_allow_html=True)
 
     # Daily cost breakdown
-    daily_cost = (
-        filtered_df.groupby("date")[["cost", "consumption_kwh"]].sum().reset_index()
-    )
+    daily_cost = daily_totals[["cost", "consumption_kwh"]].reset_index()
     daily_cost["unit_cost"] = daily_cost["cost"] / daily_cost["consumption_kwh"]
 
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
@@ -573,7 +687,7 @@ with tab3:
         x="date",
         y="cost",
         title="Daily Cost Breakdown",
-        labels={"date": "Date", "cost": "Cost ($)"},
+        labels={"date": "Date", "cost": "Cost (Rp)"},
     )
     fig.update_layout(height=400)
     st.plotly_chart(fig, use_container_width=True)
@@ -587,14 +701,16 @@ with tab3:
     with col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         # Price trend
-        daily_price = filtered_df.groupby("date")["price_per_kwh"].mean().reset_index()
+        daily_price = (
+            aggs.mean("Daily")[["price_per_kwh"]].rename_axis("date").reset_index()
+        )
 
         fig = px.line(
             daily_price,
             x="date",
             y="price_per_kwh",
             title="Price Trend",
-            labels={"date": "Date", "price_per_kwh": "Price per kWh ($)"},
+            labels={"date": "Date", "price_per_kwh": "Price per kWh (Rp)"},
         )
         fig.update_layout(height=350)
         st.plotly_chart(fig, use_container_width=True)
@@ -610,7 +726,7 @@ with tab3:
             title="Unit Cost vs. Consumption",
             labels={
                 "consumption_kwh": "Daily Consumption (kWh)",
-                "unit_cost": "Unit Cost ($/kWh)",
+                "unit_cost": "Unit Cost (Rp/kWh)",
             },
             trendline="ols",
         )
@@ -618,19 +734,50 @@ with tab3:
         st.plotly_chart(fig, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
+    # Cost by tariff band, from the running per-band consumption
+    st.markdown(
+        '<div class="sub-header">Cost by Tariff Band</div>', unsafe_allow_html=True
+    )
+
+    tariff_index = build_tariff_index(tariff_name)
+    band_kwh = tariff_index.energy(start_pos, end_pos)
+    band_costs = pd.DataFrame(
+        {
+            "Band": tariff_index.tariff.band_names + ["Demand Charge"],
+            "Cost": np.r_[
+                band_kwh * tariff_index.tariff.band_rates,
+                tariff_index.demand_cost(start_pos, end_pos),
+            ],
+            "Consumption (kWh)": np.r_[band_kwh, np.nan],
+        }
+    )
+
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+    fig = px.bar(
+        band_costs,
+        x="Band",
+        y="Cost",
+        title=f"Cost by Band - {tariff_index.tariff.name}",
+        labels={"Band": "Tariff Band", "Cost": "Cost (Rp)"},
+        hover_data=["Consumption (kWh)"],
+        text_auto=".3s",
+    )
+    fig.update_layout(height=400)
+    st.plotly_chart(fig, use_container_width=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
     # Cost projections
     st.markdown(
         '<div class="sub-header">Cost Projections</div>', unsafe_allow_html=True
     )
 
-    # Calculate daily average consumption and cost
-    avg_daily_consumption = filtered_df.groupby("date")["consumption_kwh"].sum().mean()
-    avg_daily_cost = filtered_df.groupby("date")["cost"].sum().mean()
+    # Daily average energy cost, for the savings estimates below
+    avg_daily_cost = daily_totals["cost"].mean()
 
-    # Projected costs
+    # Projected costs from the hour-of-week forecast, including demand charges
     time_periods = ["Next 7 Days", "Next 30 Days", "Next 90 Days", "Next 365 Days"]
-    days = [7, 30, 90, 365]
-    projections = [avg_daily_cost * day for day in days]
+    days = (7, 30, 90, 365)
+    projections = projected_costs(tariff_name, days)
 
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     projection_df = pd.DataFrame(
@@ -642,7 +789,7 @@ with tab3:
         x="Period",
         y="Projected Cost",
         title="Cost Projections",
-        labels={"Period": "Time Period", "Projected Cost": "Projected Cost ($)"},
+        labels={"Period": "Time Period", "Projected Cost": "Projected Cost (Rp)"},
         text_auto=".2f",
     )
     fig.update_layout(height=400)
@@ -656,9 +803,7 @@ with tab3:
     )
 
     # Find peak consumption hours
-    peak_hours = (
-        filtered_df.groupby("hour")["consumption_kwh"].mean().nlargest(5).index.tolist()
-    )
+    peak_hours = hourly_means["consumption_kwh"].nlargest(5).index.tolist()
 
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.write("Cost Saving Opportunities:")
@@ -673,8 +818,8 @@ with tab3:
         - {', '.join([f"{hour}:00" for hour in peak_hours])}
         
         ### Estimated Annual Savings
-        - 10% reduction during peak hours: **${(avg_daily_cost * 365 * 0.1):.2f}**
-        - 20% reduction during peak hours: **${(avg_daily_cost * 365 * 0.2):.2f}**
+        - 10% reduction during peak hours: **Rp {(avg_daily_cost * 365 * 0.1):,.0f}**
+        - 20% reduction during peak hours: **Rp {(avg_daily_cost * 365 * 0.2):,.0f}**
         """
         )
 
@@ -682,24 +827,25 @@ with tab3:
         st.markdown(
             f"""
         ### Energy Efficiency Improvements
-        - LED Lighting: **${(avg_daily_cost * 365 * 0.05):.2f}** annually
-        - Smart Thermostat: **${(avg_daily_cost * 365 * 0.08):.2f}** annually
-        - Energy Star Appliances: **${(avg_daily_cost * 365 * 0.12):.2f}** annually
-        - Insulation Improvements: **${(avg_daily_cost * 365 * 0.15):.2f}** annually
+        - LED Lighting: **Rp {(avg_daily_cost * 365 * 0.05):,.0f}** annually
+        - Smart Thermostat: **Rp {(avg_daily_cost * 365 * 0.08):,.0f}** annually
+        - Energy Star Appliances: **Rp {(avg_daily_cost * 365 * 0.12):,.0f}** annually
+        - Insulation Improvements: **Rp {(avg_daily_cost * 365 * 0.15):,.0f}** annually
         """
         )
 
     st.markdown("</div>", unsafe_allow_html=True)
 
 # TAB 4: APPLIANCE BREAKDOWN
-with tab4:
+if active_tab == "Appliance Breakdown":
     st.markdown(
         '<div class="sub-header">Appliance Consumption</div>', unsafe_allow_html=True
     )
 
-    # Total consumption by appliance
-    appliance_totals = filtered_appliance_df.sum().reset_index()
-    appliance_totals.columns = ["Appliance", "Consumption (kWh)"]
+    # Total, daily and hourly consumption by appliance
+    appliance_totals, daily_appliance, appliance_hourly = appliance_breakdown(
+        start_pos, end_pos, tariff_name
+    )
 
     col1, col2 = st.columns(2)
 
@@ -735,16 +881,11 @@ with tab4:
     )
 
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-    # Resample to daily for better visualization
-    daily_appliance = (
-        filtered_appliance_df.groupby(filtered_df["date"]).sum().reset_index()
-    )
-
     # Create figure
     fig = go.Figure()
 
     # Add traces for each appliance
-    for appliance in filtered_appliance_df.columns:
+    for appliance in APPLIANCES:
         fig.add_trace(
             go.Scatter(
                 x=daily_appliance["date"],
@@ -769,20 +910,6 @@ with tab4:
         '<div class="sub-header">Appliance Usage Patterns</div>', unsafe_allow_html=True
     )
 
-    # Hourly usage patterns
-    appliance_hourly = pd.DataFrame()
-    for appliance in filtered_appliance_df.columns:
-        # Create a temporary dataframe with hour and appliance data
-        temp_df = pd.DataFrame(
-            {
-                "hour": filtered_df["hour"],
-                "appliance_value": filtered_appliance_df[appliance],
-            }
-        )
-        hourly_data = temp_df.groupby("hour")["appliance_value"].mean().reset_index()
-        hourly_data["Appliance"] = appliance
-        appliance_hourly = pd.concat([appliance_hourly, hourly_data])
-
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     fig = px.line(
         appliance_hourly,
@@ -918,36 +1045,39 @@ st.sidebar.markdown("---")
 st.sidebar.markdown("### Export Data")
 
 
-# Prepare data for download
-@st.cache_data
-def convert_df_to_csv(df):
-    return df.to_csv(index=False).encode("utf-8")
-
-
 # Create download options
-download_format = st.sidebar.selectbox("Select Format", ["CSV", "Excel"])
+download_format = st.sidebar.selectbox("Select Format", list(FORMATS))
 
 download_timeframe = st.sidebar.selectbox(
     "Select Timeframe", ["Current Selection", "All Data"]
 )
 
 if download_timeframe == "Current Selection":
-    download_df = filtered_df
+    download_rows = (start_pos, end_pos)
 else:
-    download_df = df
-
-# Create download buttons
-if download_format == "CSV":
-    csv = convert_df_to_csv(download_df)
-    st.sidebar.download_button(
-        label="Download Data",
-        data=csv,
-        file_name="power_utility_data.csv",
-        mime="text/csv",
-    )
-else:
-    # For Excel format, we'll use a simple approach without actually creating Excel files
-    st.sidebar.info("Excel download would be implemented here in a production app.")
+    download_rows = (0, len(df))
+
+
+# Readings, plus the appliance sub-meters on their own sheet in Excel. The
+# data is generated per process, so its first timestamp is part of the key.
+def export_sheets():
+    rows = df.iloc[download_rows[0] : download_rows[1]]
+    sheets = {"Readings": (rows, ["timestamp"] + READING_COLUMNS)}
+    if download_format == "Excel":
+        sheets["Appliances"] = (rows, ["timestamp"] + APPLIANCES)
+    return sheets
+
+
+download_export(
+    st.sidebar,
+    "power_utility_data",
+    download_format,
+    (str(df["timestamp"].iloc[0]), download_rows),
+    export_sheets,
+    file_name="power_utility_data",
+    label="Prepare Download",
+    download_label="Download Data",
+)
 
 # Add footer
 st.markdown("---")
@@ -1,18 +1,30 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from emona.data import (
+    DATA_PATH,
+    WEATHER_COLUMNS,
+    ZONE_COLUMNS,
+    load_baseline,
+    load_changepoints,
+    load_power_consumption,
+    load_rollups,
+    load_tariff_index,
+)
+from emona.export import FORMATS, download_export
+from emona.timeindex import available_days, slice_day
+
 
 st.header("Statistics")
 
-data = pd.read_csv("data/powerconsumption.csv")
+data = load_power_consumption()
 
 st.subheader("Berdasarkan Pilihan Hari")
 
-##--- Convert Datetime column to just date
-data["Date"] = pd.to_datetime(data["Datetime"]).dt.date
-
-day_list = list(data["Date"].unique())[::-1]
+day_list = available_days(data.index)[::-1]
 
 col1, col2 = st.columns(2)
 
@@ -24,25 +36,69 @@ with col2:
 
 
 ##--- All data in the selected day
-df_selected_day = data[data["Date"] == selected_day]
+df_selected_day = slice_day(data, selected_day)
 
 if selected_zone == "Zona 1":
-    power_consumption_per_zone = df_selected_day["PowerConsumption_Zone1"]
+    zone_column = "PowerConsumption_Zone1"
 elif selected_zone == "Zona 2":
-    power_consumption_per_zone = df_selected_day["PowerConsumption_Zone2"]
+    zone_column = "PowerConsumption_Zone2"
 else:
-    power_consumption_per_zone = df_selected_day["PowerConsumption_Zone3"]
+    zone_column = "PowerConsumption_Zone3"
+
+power_consumption_per_zone = df_selected_day[zone_column]
 
-tot_power_consumption_per_zone = power_consumption_per_zone.sum()
+##--- Daily total comes from the pre-summed rollup, not from the raw rows
+daily_sum = load_rollups().table("daily", "sum")
+tot_power_consumption_per_zone = daily_sum.at[pd.Timestamp(selected_day), zone_column]
 
 
-time_day = df_selected_day["Datetime"]
+time_day = df_selected_day.index
 # zone1_power_consumption = df_selected_day["PowerConsumption_Zone1"]
-cost_per_zone = 1444.70 * tot_power_consumption_per_zone
+
+##--- Cost under the site tariff: energy per WBP/LWBP band from the running
+##--- totals, plus the day's share of the monthly demand charge
+tariff_index = load_tariff_index()
+day_start, day_end = tariff_index.bounds(selected_day, selected_day)
+zone_position = ZONE_COLUMNS.index(zone_column)
+cost_per_zone = tariff_index.cost(day_start, day_end)[zone_position]
+band_kwh = tariff_index.energy(day_start, day_end)[:, zone_position]
 
 
 st.write(df_selected_day)
 
+##--- Export: in Excel, one sheet per zone with the weather readings
+col_format, col_scope, col_export = st.columns(3, vertical_alignment="bottom")
+
+with col_format:
+    export_format = st.selectbox("Format unduhan", list(FORMATS))
+
+with col_scope:
+    export_scope = st.selectbox("Data", ["Hari terpilih", "Semua data"])
+
+export_day = str(selected_day) if export_scope == "Hari terpilih" else None
+
+
+def export_sheets():
+    rows = data if export_day is None else df_selected_day
+    if export_format != "Excel":
+        return {"data": rows}
+    return {
+        f"Zona {i}": (rows, [zone] + WEATHER_COLUMNS)
+        for i, zone in enumerate(ZONE_COLUMNS, start=1)
+    }
+
+
+download_export(
+    col_export,
+    "power_consumption",
+    export_format,
+    (os.stat(DATA_PATH).st_mtime_ns, export_day),
+    export_sheets,
+    file_name=f"power_consumption_{export_day or 'all'}",
+    label="Siapkan unduhan",
+    download_label="Unduh data",
+)
+
 st.write("\n")
 
 title = f"{selected_day.year}-{selected_day.month}-{selected_day.day}"
@@ -66,7 +122,42 @@ with col4:
 col5, col6 = st.columns([2, 3], border=True)
 
 with col5:
-    st.metric(label="Total Biaya", value=f"Rp {cost_per_zone:.2f}")
+    st.metric(
+        label="Total Biaya",
+        value=f"Rp {cost_per_zone:.2f}",
+        help=", ".join(
+            f"{band} {kwh:.1f} kWh"
+            for band, kwh in zip(tariff_index.tariff.band_names, band_kwh)
+        ),
+    )
+
+##--- Intervals outside the usual range for their hour of the week
+anomaly_flags = load_baseline().flags(time_day, df_selected_day)
+anomaly_count = int(
+    anomaly_flags[:, df_selected_day.columns.get_loc(zone_column)].sum()
+)
+
+with col6:
+    st.metric(label="Interval Anomali", value=anomaly_count)
+
+##--- Lasting shifts of the zone against its hour-of-week baseline
+zone_shifts = [
+    shift for shift in load_changepoints().events if shift.channel == zone_column
+]
+with st.expander(f"Pergeseran baseline {selected_zone} ({len(zone_shifts)})"):
+    st.dataframe(
+        pd.DataFrame(
+            [
+                (shift.start, shift.detected, shift.shift, shift.relative)
+                for shift in zone_shifts
+            ],
+            columns=["Mulai", "Terdeteksi", "Selisih (W)", "Selisih (%)"],
+        ),
+        hide_index=True,
+        column_config={
+            "Selisih (%)": st.column_config.NumberColumn(format="percent"),
+        },
+    )
 
 
 st.subheader(
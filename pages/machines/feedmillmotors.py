@@ -1,173 +1,152 @@
 import streamlit as st
-import streamviz
 import numpy as np
-import time
-
-
-def plot_gauge(
-    indicator_value,
-    title,
-    lower_indicator=1650,
-    middle_indicator=3300,
-    highest_indicator=5000,
-    size="SML",
-    mode="gauge+number",
-):
-    streamviz.gauge(
-        indicator_value,
-        gTitle=title,
-        gSize=size,
-        gMode=mode,
-        grLow=lower_indicator,
-        grMid=middle_indicator,
-        arTop=highest_indicator,
-        gcLow="#1B8720",
-        gcMid="#FF9400",
-        gcHigh="#FF1708",
+import pandas as pd
+
+from emona.components.gauge_grid import gauge_grid
+from emona.export import FORMATS, download_export
+from emona.motors import load_motor_registry
+from emona.tariff import DEFAULT_TARIFF, TARIFFS
+from emona.telemetry import get_collector
+
+
+def section_header(section, total_value, total_cost, per_kwh, band):
+    st.subheader(f"SECTION: {section}", anchor=False)
+
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.info(f"##### Total Konsumsi: {total_value:.0f} kW")
+
+    with col2:
+        st.warning(f"##### Biaya per kWh ({band}): Rp {per_kwh:.2f}")
+
+    with col3:
+        if total_cost < 20000000:
+            st.success(f"##### Total Biaya: Rp {total_cost:.2f}")
+        else:
+            st.error(f"##### Total Biaya: Rp {total_cost:.2f}")
+
+
+def section_anomalies(motors, flags, shifts):
+    ##--- Flags are set by the collector when the sample is taken
+    if flags.any():
+        tags = ", ".join(motors["tag"][flags])
+        st.error(f"Anomali konsumsi (di luar 3 sigma): {tags}", icon="⚠️")
+
+    ##--- Latest lasting shift of each motor in this section
+    for tag in motors["tag"]:
+        if tag in shifts:
+            shift = shifts[tag]
+            since = shift.start.tz_localize("UTC").tz_convert("Asia/Jakarta")
+            st.warning(
+                f"Pergeseran baseline {tag}: {shift.relative:+.1%} "
+                f"sejak {since:%d-%m-%Y %H:%M}",
+                icon="📈",
+            )
+
+
+def section_gauges(section, motors, values, per_kwh):
+    gauge_grid(
+        labels=[f"{tag} {name}" for tag, name in zip(motors["tag"], motors["name"])],
+        values=values,
+        low=motors["gauge_low"],
+        mid=motors["gauge_mid"],
+        high=motors["gauge_high"],
+        details=[
+            [f"Power: {kw:g} kW", f"{amps:g} Amp"]
+            for kw, amps in zip(motors["rated_kw"], motors["rated_amps"])
+        ],
+        unit="Watt",
+        cost_per_unit=per_kwh,
+        columns=2,
+        key=f"gauges_{section}",
     )
 
 
-def gauge_description(value, power, amp, cost):
-    st.write(f"{value} Watt")
-    st.write(f"Power: {power} kW")
-    st.write(f"{amp} Amp")
-    st.write(f"Rp {cost:.2f}")
+def live_dashboard():
+    ##--- Read the shared snapshot; sampling happens in the collector thread
+    collector = get_collector(registry.tags)
+    snapshot = collector.snapshot()
+    readings = np.nan_to_num(snapshot.take(registry.tags)).astype(int)
+    anomalies = snapshot.take_flags(registry.tags)
+    shifts = {shift.channel: shift for shift in collector.changepoints()}
 
+    ##--- Every section's totals and costs in one pass over the readings
+    ##--- Rate of the tariff band in force now, in Jakarta wall time
+    now = pd.DatetimeIndex([pd.Timestamp.now(tz="Asia/Jakarta")])
+    band = tariff.band_names[tariff.band_codes(now)[0]]
+    per_kwh = tariff.rates(now)[0]
+    section_totals = registry.section_totals(readings)
+    section_costs = section_totals * per_kwh
+
+    for i, section in enumerate(registry.sections):
+        positions = registry.positions[section]
+
+        section_header(section, section_totals[i], section_costs[i], per_kwh, band)
+        section_anomalies(registry.motors(section), anomalies[positions], shifts)
+        section_gauges(section, registry.motors(section), readings[positions], per_kwh)
+        st.divider()
+
+
+registry = load_motor_registry()
+tariff = TARIFFS[DEFAULT_TARIFF]
 
 st.header("Feed Mill Motors", anchor=False)
 
-st.subheader("SECTION: BAG GO DOWN 1", anchor=False)
+##--- Live mode only reruns the dashboard fragment, not the whole page
+live_left, live_right = st.columns([1, 3], vertical_alignment="center")
+
+with live_left:
+    live = st.toggle("Live", value=True, key="feedmill_live")
 
-value0 = np.random.randint(100, 4900)
-value1 = np.random.randint(100, 4900)
-value2 = np.random.randint(100, 4900)
-value3 = np.random.randint(100, 4900)
+with live_right:
+    refresh_seconds = st.select_slider(
+        "Interval refresh (detik)",
+        options=[1, 2, 5, 10, 30],
+        value=1,
+        disabled=not live,
+    )
 
-value4 = np.random.randint(100, 4900)
-value5 = np.random.randint(100, 4900)
-value6 = np.random.randint(100, 4900)
-value7 = np.random.randint(100, 4900)
+st.fragment(live_dashboard, run_every=refresh_seconds if live else None)()
 
-total_value1 = value0 + value1 + value2 + value3
-per_kwh = 1444.70
-total_cost1 = total_value1 * per_kwh
-
-col1, col2, col3 = st.columns(3)
 
-with col1:
-    st.info(f"##### Total Konsumsi: {total_value1} kW")
-
-with col2:
-    st.warning(f"##### Biaya per kWh: Rp {per_kwh}")
-
-with col3:
-    if total_cost1 < 20000000:
-        st.success(f"##### Total Biaya: Rp {total_cost1:.2f}")
-    else:
-        st.error(f"##### Total Biaya: Rp {total_cost1:.2f}")
+def history_sheets():
+    ##--- Readings kept by the collector; in Excel one sheet per motor
+    times, values = get_collector(registry.tags).history()
+    history = pd.DataFrame(
+        values,
+        columns=registry.tags,
+        index=pd.to_datetime(times, unit="s", utc=True)
+        .round("ms")
+        .tz_convert("Asia/Jakarta")
+        .tz_localize(None)
+        .rename("Waktu"),
+    )
+    if export_format != "Excel":
+        return {"history": history}
+    return {tag: (history, [tag]) for tag in registry.tags}
+
+
+col_format, col_export = st.columns([1, 3], vertical_alignment="bottom")
+
+with col_format:
+    export_format = st.selectbox(
+        "Format unduhan", list(FORMATS), key="feedmill_export_format"
+    )
 
-row1 = st.columns(2)
-row2 = st.columns(2)
-
-grid = [col.container(height=200) for col in row1 + row2]
-
-with grid[0]:
-    left1, right1 = st.columns([4, 2], gap="medium")
-    with left1:
-        plot_gauge(value0, "BF-111 Blower - Bag Filter")
-    with right1:
-        gauge_description(value0, 15, 6.4, value0 * per_kwh)
-
-with grid[1]:
-    left2, right2 = st.columns([4, 2], gap="medium")
-    with left2:
-        plot_gauge(value1, "CC-111 Chain Conveyor")
-    with right2:
-        gauge_description(value1, 15, 19.5, value1 * per_kwh)
-
-with grid[2]:
-    left3, right3 = st.columns([4, 2], gap="medium")
-    with left3:
-        plot_gauge(value2, "BE-112 Bucket Elevator")
-    with right3:
-        gauge_description(value2, 22, 25, value2 * per_kwh)
-
-with grid[3]:
-    left4, right4 = st.columns([4, 2], gap="medium")
-    with left4:
-        plot_gauge(value3, "DS-113 Drum Sieve")
-    with right4:
-        gauge_description(value3, 1.5, 2.2, value3 * per_kwh)
-
-
-st.divider()
-
-st.subheader("SECTION: BAG GO DOWN 2", anchor=False)
-
-value4 = np.random.randint(100, 4900)
-value5 = np.random.randint(100, 4900)
-value6 = np.random.randint(100, 4900)
-value7 = np.random.randint(100, 4900)
-
-total_value2 = value4 + value5 + value6 + value7
-per_kwh = 1444.70
-total_cost2 = total_value2 * per_kwh
-
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    st.info(f"##### Total Konsumsi: {total_value2} kW")
-
-with col2:
-    st.warning(f"##### Biaya per kWh: Rp {per_kwh}")
-
-with col3:
-    if total_cost2 < 20000000:
-        st.success(f"##### Total Biaya: Rp {total_cost2:.2f}")
-    else:
-        st.error(f"##### Total Biaya: Rp {total_cost2:.2f}")
-
-row1 = st.columns(2)
-row2 = st.columns(2)
-
-grid = [col.container(height=200) for col in row1 + row2]
-
-with grid[0]:
-    left1, right1 = st.columns([4, 2], gap="medium")
-    with left1:
-        plot_gauge(value4, "BF-121 Blower - Bag Filter")
-    with right1:
-        gauge_description(value4, 15, 6.4, value4 * per_kwh)
-
-with grid[1]:
-    left2, right2 = st.columns([4, 2], gap="medium")
-    with left2:
-        plot_gauge(value5, "CC-121 Chain Conveyor")
-    with right2:
-        gauge_description(value5, 15, 19.5, value5 * per_kwh)
-
-with grid[2]:
-    left3, right3 = st.columns([4, 2], gap="medium")
-    with left3:
-        plot_gauge(value6, "BE-122 Bucket Elevator")
-    with right3:
-        gauge_description(value6, 22, 25, value6 * per_kwh)
-
-with grid[3]:
-    left4, right4 = st.columns([4, 2], gap="medium")
-    with left4:
-        plot_gauge(value7, "DS-123 Drum Sieve")
-    with right4:
-        gauge_description(value7, 1.5, 2.2, value7 * per_kwh)
-
-st.divider()
-
-if st.button("STOP", type="primary", use_container_width=True):
-    st.stop()
-
-for count in range(1, 20):
-    time.sleep(0.95)
-    st.rerun()
+##--- The history moves every tick: a file is prepared for the latest sample,
+##--- replacing the one this session prepared before
+download_export(
+    col_export,
+    "feedmill_history",
+    export_format,
+    get_collector(registry.tags).snapshot().timestamp,
+    history_sheets,
+    file_name="feedmill_history",
+    label="Siapkan unduhan riwayat",
+    download_label="Unduh riwayat",
+    replace=True,
+)
 
 
 # col1, col2 = st.columns([2, 3])
@@ -2,16 +2,23 @@ import streamlit as st
 import pytz
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
 import plotly.express as px
-import random
 import datetime
 import locale
 from datetime import timedelta
+from functools import partial
 from streamlit_extras.metric_cards import style_metric_cards
 
-# from visualization import plot_metric
-# import visualization
+from emona.components.zoom_chart import zoom_chart
+from emona.data import (
+    ZONE_COLUMNS,
+    load_power_consumption,
+    load_rollups,
+    load_tariff_index,
+)
+from emona.rollups import fetch_window
+from emona.telemetry import get_metric_history
+from emona.visualization import plot_metric
 
 st.markdown(
     """
@@ -47,45 +54,6 @@ st.markdown(
 # )
 
 
-def plot_metric(label, value, prefix="", suffix="", show_graph=False, color_graph=""):
-    fig = go.Figure()
-    fig.add_trace(
-        go.Indicator(
-            value=value,
-            gauge={"axis": {"visible": False}},
-            number={"prefix": prefix, "suffix": suffix, "font.size": 28},
-            title={
-                "text": label,
-                "font": {"size": 24},
-            },
-        )
-    )
-
-    if show_graph:
-        fig.add_trace(
-            go.Scatter(
-                y=random.sample(range(1, 101), 30),
-                hoverinfo="skip",
-                fill="tozeroy",
-                fillcolor=color_graph,
-                line={"color": color_graph},
-            )
-        )
-
-    fig.update_xaxes(visible=False, fixedrange=True)
-    fig.update_yaxes(visible=False, fixedrange=True)
-
-    fig.update_layout(
-        # paper_bgcolor="lightgrey",
-        margin=dict(t=30, b=0),
-        showlegend=False,
-        plot_bgcolor="white",
-        height=100,
-    )
-
-    st.plotly_chart(fig, use_container_width=True)
-
-
 # ##--- Title ---
 # st.set_page_config(
 #     page_title="Energy Monitoring & Analysis",
@@ -133,38 +101,65 @@ st.write("\n")
 
 #####---------- Biaya per kWh, Total Pemakaian, Estimasi Total Biaya ----------#####
 
+kpi_labels = ("Biaya per kWh", "Total Pemakaian", "Estimasi Total Biaya")
+
+##--- Daily KPIs of the last 30 days, kept in a shared rolling history
+rollups = load_rollups()
+hours_per_row = rollups.step / pd.Timedelta(hours=1)
+daily_wh = (
+    rollups.table("daily", "sum")[ZONE_COLUMNS].tail(30).sum(axis=1) * hours_per_row
+)
+
+##--- Each day's cost under the site tariff, all days priced in one lookup;
+##--- the cost per kWh is the day's effective WBP/LWBP mix
+tariff_index = load_tariff_index()
+day_starts = tariff_index.index.searchsorted(daily_wh.index)
+day_ends = tariff_index.index.searchsorted(daily_wh.index + pd.Timedelta(days=1))
+daily_cost = tariff_index.energy_cost(day_starts, day_ends).sum(axis=1)
+with np.errstate(invalid="ignore", divide="ignore"):
+    per_kwh = daily_cost / (daily_wh.to_numpy() / 1000)
+
+kpi_history = get_metric_history(kpi_labels, capacity=30)
+kpi_history.update(daily_wh.index, np.column_stack([per_kwh, daily_wh, daily_cost]))
+cost_history = kpi_history.series("Biaya per kWh")
+usage_history = kpi_history.series("Total Pemakaian")
+total_cost_history = kpi_history.series("Estimasi Total Biaya")
+
 total_left, total_middle, total_right = st.columns(3, gap="small", border=True)
 
 with total_left:
     plot_metric(
         "Biaya per kWh",
-        1440,
+        cost_history[-1],
         prefix="Rp ",
         suffix="",
         show_graph=True,
         color_graph="rgba(203, 195, 227, .5)",
+        history=cost_history,
     )
 
 with total_middle:
     plot_metric(
         "Total Pemakaian",
-        163027,
+        usage_history[-1],
         prefix="",
         suffix="Wh",
         show_graph=True,
         color_graph="rgba(253, 237, 236, 1)",
+        history=usage_history,
     )
 
 with total_right:
     plot_metric(
         "Estimasi Total Biaya",
-        74877321,
+        total_cost_history[-1],
         prefix="Rp ",
         suffix="",
         show_graph=True,
         color_graph="rgba(242, 244, 244, 1)",
         # color_graph="rgba(234, 236, 238, 1)",
         # color_graph="rgba(255, 43, 43, 0.1)",
+        history=total_cost_history,
     )
 
 # st.divider()
@@ -451,12 +446,10 @@ with col13:
 
 st.markdown('<div class="sub-header">Plot Pemakaian</div>', unsafe_allow_html=True)
 
-data = pd.read_csv("data/powerconsumption.csv")
+data = load_power_consumption()
 
-##--- Convert Datetime column to just date
-data["Date"] = pd.to_datetime(data["Datetime"]).dt.date
-max_date = data["Date"].max()
-min_date = data["Date"].min()
+max_date = data.index[-1].date()
+min_date = data.index[0].date()
 
 default_start_date = min_date
 default_end_date = max_date
@@ -487,13 +480,11 @@ selected_date = st.slider(
     step=timedelta(days=1),
 )
 
-df_display = data.set_index("Date")
-
-mask = (df_display.index >= selected_date[0]) & (df_display.index <= selected_date[1])
-
-filtered_data = df_display.loc[mask]
-x_obj = filtered_data["Datetime"]
-y_obj = filtered_data["PowerConsumption_Zone1"]
-
-line_chart = px.line(x=x_obj, y=y_obj)
-st.plotly_chart(line_chart)
+##--- Zooming refetches the visible window at a resolution that fits the chart
+zoom_chart(
+    partial(fetch_window, data, rollups, ["PowerConsumption_Zone1"]),
+    selected_date[0],
+    pd.Timestamp(selected_date[1]).replace(hour=23, minute=59, second=59),
+    key="usage_chart",
+    y_title="PowerConsumption_Zone1",
+)